@@ -0,0 +1,152 @@
+from selenium import webdriver
+from selenium.webdriver.support.ui import WebDriverWait
+from urllib.parse import quote
+import argparse
+import os
+import time as sleep_time
+
+# "lean" = headless, no images/media/fonts/trackers, small viewport, eager page loads; "full" = the original visible browser
+BROWSER_MODE = os.environ.get("REDBUS_BROWSER_MODE", "lean")
+LEAN_VIEWPORT = (1280, 900)
+
+# Third-party analytics/ad hosts the scraper never reads; routed to a dead proxy in lean mode
+BLOCKED_DOMAINS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "facebook.net",
+    "connect.facebook.net",
+    "hotjar.com",
+    "clarity.ms",
+    "moengage.com",
+    "branch.io",
+    "nr-data.net",
+    "newrelic.com",
+    "criteo.com",
+    "taboola.com",
+]
+
+LEAN_PREFERENCES = {
+    "permissions.default.image": 2,  # never load images
+    "media.autoplay.default": 5,  # block all autoplay
+    "media.autoplay.blocking_policy": 2,
+    "media.mediasource.enabled": False,
+    "media.hls.enabled": False,
+    "gfx.downloadable_fonts.enabled": False,  # skip @font-face downloads
+    "browser.display.use_document_fonts": 0,
+    "privacy.trackingprotection.enabled": True,
+    "browser.contentblocking.category": "strict",
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "network.http.speculative-parallel-limit": 0,
+    "browser.cache.disk.enable": False,
+    "toolkit.telemetry.enabled": False,
+    "datareporting.healthreport.uploadEnabled": False,
+}
+
+def blocking_pac_url(domains=BLOCKED_DOMAINS):
+    """Proxy auto-config that sends blocked domains to an unreachable proxy and everything else direct."""
+    checks = " || ".join(f'dnsDomainIs(host, "{domain}")' for domain in domains)
+    script = f'function FindProxyForURL(url, host) {{ if ({checks}) return "PROXY 127.0.0.1:9"; return "DIRECT"; }}'
+    return "data:application/x-ns-proxy-autoconfig," + quote(script)
+
+def lean_firefox_options():
+    options = webdriver.FirefoxOptions()
+    options.add_argument("-headless")
+    options.add_argument(f"--width={LEAN_VIEWPORT[0]}")
+    options.add_argument(f"--height={LEAN_VIEWPORT[1]}")
+    options.page_load_strategy = "eager"
+    for name, value in LEAN_PREFERENCES.items():
+        options.set_preference(name, value)
+    options.set_preference("network.proxy.type", 2)
+    options.set_preference("network.proxy.autoconfig_url", blocking_pac_url())
+    return options
+
+def create_browser(mode=None, headless=False):
+    """Shared Firefox factory for every entry point.
+
+    lean mode is always headless; full mode keeps the original maximised window unless headless is asked for.
+    """
+    mode = mode or BROWSER_MODE
+    if mode == "lean":
+        driver = webdriver.Firefox(options=lean_firefox_options())
+        driver.set_window_size(*LEAN_VIEWPORT)
+        return driver
+    if mode != "full":
+        raise ValueError(f"Unknown browser mode '{mode}', expected 'lean' or 'full'")
+
+    options = webdriver.FirefoxOptions()
+    if headless:
+        options.add_argument("-headless")
+    driver = webdriver.Firefox(options=options)
+    driver.maximize_window()
+    return driver
+
+PAGE_WEIGHT_SCRIPT = """
+const navigation = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+let bytes = navigation ? navigation.transferSize : 0;
+for (const entry of resources) { bytes += entry.transferSize; }
+return {bytes: bytes, requests: resources.length + 1};
+"""
+
+def measure_page_load(driver, url, settle_timeout=10):
+    """Time driver.get(url), then let the page finish and total the bytes it transferred."""
+    started = sleep_time.monotonic()
+    driver.get(url)
+    load_seconds = sleep_time.monotonic() - started
+    try:
+        WebDriverWait(driver, settle_timeout).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+    except Exception:
+        pass
+    weight = driver.execute_script(PAGE_WEIGHT_SCRIPT)
+    return load_seconds, weight["bytes"], weight["requests"]
+
+def compare_browser_modes(urls, repeats=3):
+    """Load the same pages in lean and full mode and print average load time and bytes transferred."""
+    results = {}
+    for mode in ("full", "lean"):
+        driver = create_browser(mode=mode, headless=True)
+        samples = []
+        try:
+            for _ in range(repeats):
+                for url in urls:
+                    samples.append(measure_page_load(driver, url))
+        finally:
+            driver.quit()
+        results[mode] = {
+            "seconds": sum(sample[0] for sample in samples) / len(samples),
+            "bytes": sum(sample[1] for sample in samples) / len(samples),
+            "requests": sum(sample[2] for sample in samples) / len(samples),
+        }
+        print(f"{mode:>4}: {results[mode]['seconds'] * 1000:.0f} ms/page, "
+              f"{results[mode]['bytes'] / 1024:.1f} KiB/page, {results[mode]['requests']:.1f} requests/page")
+
+    if results["full"]["seconds"] and results["full"]["bytes"]:
+        print(f"lean vs full: {results['lean']['seconds'] / results['full']['seconds']:.2f}x load time, "
+              f"{results['lean']['bytes'] / results['full']['bytes']:.2f}x bytes")
+    return results
+
+if __name__ == "__main__":
+    from redbus_fixture_server import start_fixture_server
+
+    parser = argparse.ArgumentParser(description="Compare lean and full browser modes on local fixture pages")
+    parser.add_argument("--compare", action="store_true", help="run the lean vs full comparison")
+    parser.add_argument("--pages", nargs="+", default=["route_with_assets.html"],
+                        help="fixture pages (relative to fixtures/) to load")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="artificial server latency in seconds")
+    args = parser.parse_args()
+
+    if args.compare:
+        server, base_url = start_fixture_server(latency=args.latency)
+        try:
+            compare_browser_modes([f"{base_url}/{page}" for page in args.pages], repeats=args.repeats)
+        finally:
+            server.shutdown()
+    else:
+        parser.print_help()
@@ -0,0 +1,108 @@
+import io
+import pandas as pd
+
+# Natural key of a scraped bus: the same route label and page, operator and departure on the same day.
+# route_name is part of it because a page shared by several agencies is stored once per label.
+NATURAL_KEY = ['route_name', 'route_link', 'bus_name', 'departing_time', 'departing_date']
+# Rows per COPY chunk, so the CSV buffer never holds more than this many rows
+COPY_CHUNK_ROWS = 50000
+
+def ensure_table(engine, create_table_query, table, key_columns=NATURAL_KEY):
+    """Create table if needed (the query must use IF NOT EXISTS) plus the unique index ON CONFLICT relies on.
+
+    A natural-key index built on other columns (an older NATURAL_KEY) is dropped and rebuilt.
+    """
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(create_table_query)
+            cursor.execute("SELECT indexdef FROM pg_indexes WHERE indexname = %s", (f"{table}_natural_key",))
+            existing = cursor.fetchone()
+            if existing and not existing[0].endswith(f"({', '.join(key_columns)})"):
+                cursor.execute(f"DROP INDEX {table}_natural_key")
+            cursor.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_natural_key ON {table} ({', '.join(key_columns)})"
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+def _table_columns(cursor, table):
+    """(name, type) of every column of table in the current schema, in column order."""
+    cursor.execute(
+        """
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position
+        """,
+        (table,),
+    )
+    return cursor.fetchall()
+
+def _as_copy_text(chunk):
+    """Format timedelta64 columns (times of day) as HH:MM:SS, which Postgres reads as TIME."""
+    for column in chunk.columns:
+        if pd.api.types.is_timedelta64_dtype(chunk[column]):
+            chunk = chunk.assign(**{column: (pd.Timestamp(0) + chunk[column]).dt.strftime('%H:%M:%S')})
+    return chunk
+
+def _copy_frame(cursor, table, frame):
+    """Stream a DataFrame into table with COPY FROM STDIN, one CSV chunk at a time."""
+    columns = ', '.join(frame.columns)
+    for start in range(0, len(frame), COPY_CHUNK_ROWS):
+        buffer = io.StringIO()
+        _as_copy_text(frame.iloc[start:start + COPY_CHUNK_ROWS]).to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def copy_upsert(engine, table, frame, key_columns=NATURAL_KEY, default_columns=()):
+    """Bulk-load frame into table: COPY into an unlogged staging table, then INSERT ... ON CONFLICT.
+
+    Rerunning with the same rows updates them in place instead of duplicating them. Columns of the
+    key missing from frame (e.g. departing_date on raw scraped rows) take the table default, as do
+    default_columns, which are also rewritten on conflict (e.g. a server-side ingested_at). The
+    staging table is recreated whenever its columns no longer match table's.
+    Returns the number of rows inserted or updated.
+    """
+    if frame.empty:
+        return 0
+    staging = f"{table}_staging"
+    columns = list(frame.columns) + [column for column in [*key_columns, *default_columns] if column not in frame.columns]
+    update_columns = [column for column in columns if column not in key_columns]
+    column_list = ', '.join(columns)
+    key_list = ', '.join(key_columns)
+    on_conflict = (
+        "DO UPDATE SET " + ', '.join(f"{column} = EXCLUDED.{column}" for column in update_columns)
+        if update_columns else "DO NOTHING"
+    )
+
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            # A staging table copied from an older layout of table (renamed or added columns) is rebuilt
+            staging_columns = _table_columns(cursor, staging)
+            if staging_columns and staging_columns != _table_columns(cursor, table):
+                cursor.execute(f"DROP TABLE {staging}")
+            cursor.execute(f"CREATE UNLOGGED TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS)")
+            # One loader at a time per staging table
+            cursor.execute(f"LOCK TABLE {staging} IN EXCLUSIVE MODE")
+            cursor.execute(f"TRUNCATE {staging}")
+            _copy_frame(cursor, staging, frame)
+            # DISTINCT ON: a single INSERT ... ON CONFLICT may not touch the same key twice; the last copy wins
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({column_list})
+                SELECT DISTINCT ON ({key_list}) {column_list} FROM {staging}
+                ORDER BY {key_list}, ctid DESC
+                ON CONFLICT ({key_list}) {on_conflict}
+                """
+            )
+            merged = cursor.rowcount
+            cursor.execute(f"TRUNCATE {staging}")
+        connection.commit()
+        return merged
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
@@ -0,0 +1,285 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from redbus_route_index import canonical_route_url, fan_out_rows
+
+CRAWL_STATE_PATH = os.environ.get("REDBUS_CRAWL_STATE", "redbus_crawl_state.sqlite3")
+# A route that has failed this many times is left alone by --resume runs
+MAX_ROUTE_ATTEMPTS = 3
+
+BUS_ROW_COLUMNS = ['route_name', 'route_link', 'bus_name', 'bus_type', 'departing_time', 'duration','reaching_time', 'star_rating', 'price', 'seats_available']
+
+CRAWL_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agencies (
+    agency_name TEXT PRIMARY KEY,
+    agency_link TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS routes (
+    route_name TEXT PRIMARY KEY,
+    route_link TEXT,
+    canonical_url TEXT,
+    agency_name TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    fingerprint TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS bus_rows (
+    route_name TEXT,
+    position INTEGER,
+    route_link TEXT,
+    bus_name TEXT,
+    bus_type TEXT,
+    departing_time TEXT,
+    duration TEXT,
+    reaching_time TEXT,
+    star_rating TEXT,
+    price TEXT,
+    seats_available TEXT,
+    PRIMARY KEY (route_name, position)
+);
+CREATE TABLE IF NOT EXISTS route_fingerprints (
+    route_name TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    row_count INTEGER,
+    loaded_at TEXT
+);
+"""
+
+# Pool workers share one connection, so every statement goes through this lock
+_state_lock = threading.Lock()
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+def open_crawl_state(path=CRAWL_STATE_PATH):
+    """Open (creating if needed) the SQLite file that checkpoints a crawl."""
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.executescript(CRAWL_STATE_SCHEMA)
+    # Checkpoints written by older versions lack the newer columns
+    route_columns = [column[1] for column in connection.execute("PRAGMA table_info(routes)")]
+    if "fingerprint" not in route_columns:
+        connection.execute("ALTER TABLE routes ADD COLUMN fingerprint TEXT")
+    if "canonical_url" not in route_columns:
+        connection.execute("ALTER TABLE routes ADD COLUMN canonical_url TEXT")
+        connection.execute("UPDATE routes SET canonical_url = route_link")
+    connection.execute("CREATE INDEX IF NOT EXISTS routes_canonical_url ON routes (canonical_url)")
+    connection.commit()
+    return connection
+
+def reset_crawl_state(connection):
+    """Forget everything from a previous crawl; used when a run starts without --resume.
+
+    route_fingerprints survive the reset, they describe what the database already holds.
+    """
+    with _state_lock, connection:
+        connection.execute("DELETE FROM bus_rows")
+        connection.execute("DELETE FROM routes")
+        connection.execute("DELETE FROM agencies")
+
+def save_agencies(connection, agencies_dict):
+    """Record discovered agencies as pending; agencies already known keep their status."""
+    with _state_lock, connection:
+        connection.executemany(
+            "INSERT OR IGNORE INTO agencies (agency_name, agency_link, updated_at) VALUES (?, ?, ?)",
+            [(name, link, _now()) for name, link in agencies_dict.items()],
+        )
+
+def load_agencies(connection, status=None):
+    """Agency name -> listing link, in discovery order, optionally only those with the given status."""
+    query = "SELECT agency_name, agency_link FROM agencies"
+    params = []
+    if status:
+        query += " WHERE status = ?"
+        params.append(status)
+    with _state_lock:
+        return dict(connection.execute(query + " ORDER BY rowid", params).fetchall())
+
+def mark_agency_done(connection, agency_name, agency_links):
+    """Store the route links found for an agency and mark the agency as fully extracted."""
+    with _state_lock, connection:
+        connection.executemany(
+            "INSERT OR IGNORE INTO routes (route_name, route_link, canonical_url, agency_name, updated_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                (route_name, route_link, canonical_route_url(route_link), agency_name, _now())
+                for route_name, route_link in agency_links.items()
+            ],
+        )
+        connection.execute(
+            "UPDATE agencies SET status = 'done', updated_at = ? WHERE agency_name = ?", (_now(), agency_name)
+        )
+
+def load_route_links(connection):
+    """Every known route name -> route link, in discovery order."""
+    with _state_lock:
+        return dict(connection.execute("SELECT route_name, route_link FROM routes ORDER BY rowid").fetchall())
+
+def routes_to_scrape(connection, max_attempts=MAX_ROUTE_ATTEMPTS):
+    """Routes that still need work: never tried, or interrupted or failed after fewer than max_attempts attempts.
+
+    mark_route_started counts an attempt, so a route that crashes the whole process is given up on too.
+    Only the first label of each canonical URL is returned; finishing it settles every label of that page.
+    """
+    with _state_lock:
+        return {route_name: route_link for route_name, route_link, _ in connection.execute(
+            """
+            SELECT route_name, route_link, MIN(rowid) FROM routes
+            WHERE status = 'pending'
+               OR (status IN ('in_progress', 'failed') AND attempts < ?)
+            GROUP BY canonical_url
+            ORDER BY MIN(rowid)
+            """,
+            (max_attempts,),
+        ).fetchall()}
+
+def _same_page_routes(connection, route_name):
+    """(route_name, route_link) of every label whose URL canonicalises to the same page as route_name."""
+    return connection.execute(
+        """
+        SELECT route_name, route_link FROM routes
+        WHERE canonical_url = (SELECT canonical_url FROM routes WHERE route_name = ?)
+        ORDER BY rowid
+        """,
+        (route_name,),
+    ).fetchall()
+
+def route_status_counts(connection):
+    with _state_lock:
+        return dict(connection.execute("SELECT status, COUNT(*) FROM routes GROUP BY status").fetchall())
+
+def mark_route_started(connection, route_name):
+    with _state_lock, connection:
+        connection.execute(
+            """
+            UPDATE routes SET status = 'in_progress', attempts = attempts + 1, updated_at = ?
+            WHERE canonical_url = (SELECT canonical_url FROM routes WHERE route_name = ?)
+            """,
+            (_now(), route_name),
+        )
+
+def requeue_routes(connection, route_names):
+    """Set routes (and every label of the same page) back to pending with a fresh attempt count.
+
+    Used for routes that were scraped and marked done but whose rows never reached the database, so the
+    next --resume scrapes and writes them again. Returns the number of labels re-queued.
+    """
+    route_names = list(route_names)
+    with _state_lock, connection:
+        return connection.execute(
+            f"""
+            UPDATE routes SET status = 'pending', attempts = 0, updated_at = ?
+            WHERE canonical_url IN (SELECT canonical_url FROM routes WHERE route_name IN ({', '.join('?' * len(route_names))}))
+            """,
+            [_now()] + route_names,
+        ).rowcount
+
+def route_fingerprint(rows):
+    """Order-independent hash of a route's normalised card list (route name/link excluded)."""
+    cards = sorted(
+        json.dumps([" ".join(str(row[column]).split()) for column in BUS_ROW_COLUMNS[2:]])
+        for row in rows
+    )
+    return hashlib.sha256("\n".join(cards).encode("utf-8")).hexdigest()
+
+def mark_route_done(connection, route_name, rows):
+    """Persist a route's scraped rows and fingerprint and mark it done in one transaction.
+
+    The rows are fanned out to every other label of the same page (with that label's name and link),
+    so a page shared by several agencies is scraped once. Returns route_name -> rows for every label.
+    """
+    fingerprint = route_fingerprint(rows)
+    with _state_lock, connection:
+        labelled_rows = fan_out_rows(rows, _same_page_routes(connection, route_name))
+        labelled_rows[route_name] = rows
+        for label, label_rows in labelled_rows.items():
+            connection.execute("DELETE FROM bus_rows WHERE route_name = ?", (label,))
+            connection.executemany(
+                f"INSERT INTO bus_rows (position, {', '.join(BUS_ROW_COLUMNS)}) VALUES ({', '.join('?' * (len(BUS_ROW_COLUMNS) + 1))})",
+                [[position] + [row[column] for column in BUS_ROW_COLUMNS] for position, row in enumerate(label_rows)],
+            )
+            connection.execute(
+                "UPDATE routes SET status = 'done', fingerprint = ?, updated_at = ? WHERE route_name = ?",
+                (fingerprint, _now(), label),
+            )
+    return labelled_rows
+
+def mark_route_failed(connection, route_name):
+    with _state_lock, connection:
+        connection.execute(
+            """
+            UPDATE routes SET status = 'failed', updated_at = ?
+            WHERE canonical_url = (SELECT canonical_url FROM routes WHERE route_name = ?)
+            """,
+            (_now(), route_name),
+        )
+
+def load_scraped_rows(connection, changed_only=False):
+    """All checkpointed bus rows, in route discovery order then page order.
+
+    changed_only drops routes whose fingerprint matches the one recorded at the last successful load.
+    """
+    query = f"""
+        SELECT {', '.join('b.' + column for column in BUS_ROW_COLUMNS)}
+        FROM bus_rows b
+        JOIN routes r ON r.route_name = b.route_name
+        LEFT JOIN route_fingerprints f ON f.route_name = r.route_name
+        WHERE r.status = 'done'
+    """
+    if changed_only:
+        query += " AND (f.fingerprint IS NULL OR f.fingerprint != r.fingerprint)"
+    with _state_lock:
+        cursor = connection.execute(query + " ORDER BY r.rowid, b.position")
+        return [dict(zip(BUS_ROW_COLUMNS, values)) for values in cursor.fetchall()]
+
+def route_unchanged(connection, route_name):
+    """True when a finished route's fingerprint matches the last successful load."""
+    with _state_lock:
+        return connection.execute(
+            """
+            SELECT 1 FROM routes r JOIN route_fingerprints f ON f.route_name = r.route_name
+            WHERE r.route_name = ? AND r.status = 'done' AND f.fingerprint = r.fingerprint
+            """,
+            (route_name,),
+        ).fetchone() is not None
+
+def route_change_counts(connection):
+    """Compare this crawl's fingerprints with the last loaded ones: new, changed, unchanged and gone routes."""
+    with _state_lock:
+        counts = dict(connection.execute(
+            """
+            SELECT CASE
+                       WHEN f.route_name IS NULL THEN 'new'
+                       WHEN f.fingerprint = r.fingerprint THEN 'unchanged'
+                       ELSE 'changed'
+                   END AS change, COUNT(*)
+            FROM routes r LEFT JOIN route_fingerprints f ON f.route_name = r.route_name
+            WHERE r.status = 'done'
+            GROUP BY change
+            """
+        ).fetchall())
+        counts["gone"] = connection.execute(
+            "SELECT COUNT(*) FROM route_fingerprints WHERE route_name NOT IN (SELECT route_name FROM routes)"
+        ).fetchone()[0]
+    for change in ("new", "changed", "unchanged"):
+        counts.setdefault(change, 0)
+    return counts
+
+def commit_route_fingerprints(connection):
+    """After the database write succeeded, remember what was loaded and forget routes that disappeared."""
+    with _state_lock, connection:
+        connection.execute(
+            """
+            INSERT OR REPLACE INTO route_fingerprints (route_name, fingerprint, row_count, loaded_at)
+            SELECT r.route_name, r.fingerprint, COUNT(b.position), ?
+            FROM routes r LEFT JOIN bus_rows b ON b.route_name = r.route_name
+            WHERE r.status = 'done'
+            GROUP BY r.route_name, r.fingerprint
+            """,
+            (_now(),),
+        )
+        connection.execute("DELETE FROM route_fingerprints WHERE route_name NOT IN (SELECT route_name FROM routes)")
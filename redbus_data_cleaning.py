@@ -2,16 +2,60 @@ import pandas as pd
 from sqlalchemy import create_engine, text
 from datetime import datetime, timedelta, time
 import re
+import argparse
+import os
+import sys
+import time as sleep_time
+from redbus_bulk_loader import ensure_table, copy_upsert
+from redbus_parquet_stage import count_stage_rows, read_parquet_chunks
+from redbus_search import PAGE_ORDER_SQL
 
-def db_loader_cleaned(engine_object_input,df):
-    create_table_query = """
-    CREATE TABLE bus_routes (
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+# Rows read from bus_details_backup per server-side cursor fetch; one chunk is cleaned and written at a time
+CLEAN_CHUNK_ROWS = int(os.environ.get("REDBUS_CLEAN_CHUNK_ROWS", 50000))
+# Set by the scraper on every bus_details_backup row; used for the watermark, not copied to bus_routes
+INGESTION_COLUMNS = ['scrape_run_id', 'ingested_at']
+# Few distinct values repeated on every bus: stored as pandas categoricals by compact_bus_routes
+CATEGORY_COLUMNS = ['agency', 'route_name', 'route_link', 'bus_name', 'bus_type']
+
+# Indexes for the filter combinations search_buses sends: a route with a departure window or a price
+# range, any route by departure window or by price and rating, and the MAX() lookups of the filters
+SEARCH_INDEXES = {
+    "route_departure": "route_id, departing_time",
+    "route_price": "route_id, price_inr",
+    "departure_price": "departing_time, price_inr",
+    "price_rating": "price_inr, star_rating_out_of_5",
+    # Order of the paged results (the same COALESCE expressions), so a page is read in index order
+    "page_order": ", ".join(f"({expression})" for expression in PAGE_ORDER_SQL),
+    "total_seats": "total_seats",
+}
+
+def create_routes_table(engine_object_input, table="bus_routes", indexes=True):
+    create_table_query = f"""
+    -- Dimensions: one row per agency and per route label, referenced by integer keys
+    CREATE TABLE IF NOT EXISTS agencies (
+        agency_id SERIAL PRIMARY KEY,
+        agency_name TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE IF NOT EXISTS routes (
+        route_id SERIAL PRIMARY KEY,
+        route_name TEXT NOT NULL UNIQUE,
+        agency_id INTEGER NOT NULL REFERENCES agencies (agency_id)
+    );
+    CREATE INDEX IF NOT EXISTS routes_agency ON routes (agency_id, route_name);
+    CREATE TABLE IF NOT EXISTS {table} (
+        route_id INTEGER REFERENCES routes (route_id),
+        agency TEXT,
         route_name TEXT,
         route_link TEXT,
         bus_name TEXT,
         bus_type TEXT,
         departing_time TIME,
-        duration TEXT,
+        duration_minutes INTEGER,
         reaching_time TIME,
         star_rating_out_of_5 NUMERIC(2, 1),
         price_inr NUMERIC(10, 2),
@@ -20,15 +64,123 @@ def db_loader_cleaned(engine_object_input,df):
         departing_date DATE,
         reaching_date DATE
     );
-
+    -- Tables created before the typed layout kept duration as 'Xh Ym' text and had no agency column
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = '{table}' AND column_name = 'duration') THEN
+            ALTER TABLE {table} ALTER COLUMN duration TYPE INTEGER
+                USING coalesce(substring(duration from '([0-9]+)h')::int, 0) * 60
+                      + coalesce(substring(duration from '([0-9]+)m')::int, 0);
+            ALTER TABLE {table} RENAME COLUMN duration TO duration_minutes;
+        END IF;
+    END $$;
+    -- Backfilled only when the column is added; new rows arrive with their agency
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = current_schema() AND table_name = '{table}' AND column_name = 'agency') THEN
+            ALTER TABLE {table} ADD COLUMN agency TEXT;
+            UPDATE {table} SET agency = trim(split_part(route_name, '_', 1));
+        END IF;
+    END $$;
+    -- Rows loaded before the dimensions existed get their route_id when the column is added;
+    -- new rows arrive with one from attach_route_ids
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = current_schema() AND table_name = '{table}' AND column_name = 'route_id') THEN
+            ALTER TABLE {table} ADD COLUMN route_id INTEGER REFERENCES routes (route_id);
+            INSERT INTO agencies (agency_name)
+            SELECT DISTINCT agency FROM {table} WHERE agency IS NOT NULL
+            ON CONFLICT (agency_name) DO NOTHING;
+            INSERT INTO routes (route_name, agency_id)
+            SELECT DISTINCT ON (b.route_name) b.route_name, a.agency_id
+            FROM {table} b JOIN agencies a ON a.agency_name = b.agency
+            WHERE b.route_name IS NOT NULL
+            ON CONFLICT (route_name) DO NOTHING;
+            UPDATE {table} b SET route_id = r.route_id FROM routes r WHERE r.route_name = b.route_name;
+        END IF;
+    END $$;
     """
 
-    # Execute the query using the engine
-    with engine_object_input.connect() as connection:
-        connection.execute(text(create_table_query))
-        connection.commit()
+    # Create the table and the natural-key index the upsert relies on
+    ensure_table(engine_object_input, create_table_query, table)
+    if indexes:
+        create_search_indexes(engine_object_input, table)
+    print("Table ready!")
 
-    print("Table created successfully!")
+def create_search_indexes(engine_object_input, table="bus_routes"):
+    with engine_object_input.begin() as connection:
+        # Replaced by page_order, whose expressions match the paged ORDER BY
+        connection.execute(text(f"DROP INDEX IF EXISTS {table}_price_departure"))
+        for name, columns in SEARCH_INDEXES.items():
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS {table}_{name} ON {table} ({columns})"))
+
+def attach_route_ids(engine_object_input, df):
+    """compact_bus_routes frame plus route_id, adding any agency or route not yet in the dimension tables."""
+    pairs = df[['route_name', 'agency']].astype(object).dropna().drop_duplicates('route_name')
+    routes = pairs['route_name'].tolist()
+    with engine_object_input.begin() as connection:
+        connection.execute(text("""
+        INSERT INTO agencies (agency_name) SELECT DISTINCT unnest(CAST(:agencies AS TEXT[]))
+        ON CONFLICT (agency_name) DO NOTHING
+        """), {"agencies": pairs['agency'].tolist()})
+        connection.execute(text("""
+        INSERT INTO routes (route_name, agency_id)
+        SELECT pair.route_name, agencies.agency_id
+        FROM unnest(CAST(:routes AS TEXT[]), CAST(:agencies AS TEXT[])) AS pair (route_name, agency_name)
+        JOIN agencies USING (agency_name)
+        ON CONFLICT (route_name) DO NOTHING
+        """), {"routes": routes, "agencies": pairs['agency'].tolist()})
+        route_ids = dict(connection.execute(
+            text("SELECT route_name, route_id FROM routes WHERE route_name = ANY(CAST(:routes AS TEXT[]))"),
+            {"routes": routes},
+        ).all())
+    df = df.copy()
+    df['route_id'] = df['route_name'].astype(object).map(route_ids).astype('Int32')
+    return df
+
+def create_cleaning_runs_table(engine_object_input):
+    # One row per successful cleaning run; the newest watermark is the high-water mark of the next run
+    with engine_object_input.begin() as connection:
+        connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS cleaning_runs (
+            run_id SERIAL PRIMARY KEY,
+            started_at TIMESTAMPTZ NOT NULL,
+            finished_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            watermark TIMESTAMPTZ,
+            rows_processed INTEGER NOT NULL,
+            rows_skipped INTEGER NOT NULL
+        )
+        """))
+
+def bump_data_version(engine_object_input, table="bus_routes"):
+    """Advance table's data-version marker; the frontend's result cache drops everything when it changes."""
+    with engine_object_input.begin() as connection:
+        connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version BIGINT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """))
+        return connection.execute(text("""
+        INSERT INTO data_versions (table_name, version) VALUES (:table, 1)
+        ON CONFLICT (table_name) DO UPDATE SET version = data_versions.version + 1, updated_at = now()
+        RETURNING version
+        """), {"table": table}).scalar()
+
+def db_loader_cleaned(engine_object_input,df):
+    create_routes_table(engine_object_input)
+    try:
+        merged = copy_upsert(engine_object_input, "bus_routes", attach_route_ids(engine_object_input, df))
+        bump_data_version(engine_object_input)
+        print(f"Data inserted successfully! {merged} rows inserted or updated")
+        return True
+    except Exception as e:
+        print("Error:", e)
+        return False
 
 def clean_duration(duration_str):
     """Cleans up duration by standardizing the format to 'Xh Ym'."""
@@ -58,13 +210,6 @@ def split_reaching_time(reaching_time_str):
         print(f"Error splitting reaching_time: {reaching_time_str} - {e}")
         return None, None
 
-df[['reaching_time', 'reaching_date']] = df['reaching_time'].apply(
-    lambda x: pd.Series(split_reaching_time(x))
-)
-
-# Convert 'departing_date' and 'reaching_date' into datetime format
-df['departing_date'] = pd.to_datetime(df['departing_date'], format='%d-%m-%Y')
-
 def parse_reaching_date(date_str):
     """Parses reaching_date with dynamic format detection and assigns year 2025."""
     try:
@@ -85,8 +230,6 @@ def parse_reaching_date(date_str):
         print(f"Error parsing reaching_date: {date_str} - {e}")
         return None
 
-df['reaching_date'] = df['reaching_date'].apply(parse_reaching_date)
-
 # Split 'seats_available' into separate columns
 def split_seats(seats_str):
     """Splits seats and window numbers."""
@@ -99,37 +242,283 @@ def split_seats(seats_str):
         print(f"Error splitting seats: {seats_str} - {e}")
         return 0, 0
 
+# Vectorized equivalents of the row functions above: same values, same fallbacks, no per-row Python calls
+DURATION_PATTERN = r'(\d+)h(?:\s*(\d+)m)?|(\d+)m'
+# First word before the '|' and first word after it, each captured only when int() would accept it
+SEATS_PATTERN = r'^\s*(?:([+-]?\d+)(?=\s|\||$))?[^|]*(\|)?\s*(?:([+-]?\d+)(?=\s|\||$))?'
+
+def _text(series):
+    """Object-dtype view of a column, so .str works even when every value is missing."""
+    return series.astype(object)
+
+def _is_text(text):
+    """True where the value is a string (.str methods give NaN for everything else)."""
+    return text.str.len().notna()
+
+def clean_duration_column(durations):
+    """clean_duration for a whole column: 'Xh Ym', or '0h 0m' when nothing matches."""
+    parts = _text(durations).str.extract(DURATION_PATTERN)
+    hours = parts[0].fillna('0').astype('int64')
+    minutes = parts[1].fillna(parts[2]).fillna('0').astype('int64')
+    return hours.astype(str) + 'h ' + minutes.astype(str) + 'm'
+
+def split_reaching_time_column(reaching_times):
+    """split_reaching_time for a whole column: (time, date) Series; more than one '(' or a non-string gives (None, None)."""
+    text = _text(reaching_times)
+    is_text = _is_text(text)
+    brackets = text.str.count(r'\(')
+    parts = text.str.extract(r'^([^(]*)\((.*)$', flags=re.DOTALL)
+    before, after = parts[0], parts[1]
+    with_date = is_text & (brackets == 1)
+    without_date = is_text & (brackets == 0)
+    times = pd.Series(None, index=text.index, dtype=object)
+    dates = pd.Series(None, index=text.index, dtype=object)
+    times[with_date] = before[with_date].str.strip()
+    dates[with_date] = after[with_date].str.strip(')').str.strip()
+    times[without_date] = text[without_date].str.strip()
+    # Same dtype inference as building the columns from per-row pd.Series
+    return times.infer_objects(), dates
+
+def parse_reaching_date_column(dates):
+    """parse_reaching_date for a whole column: 'dd-mm-YYYY' dates, 'dd-Mon' dates in 2025, NaT otherwise."""
+    text = _text(dates)
+    is_text = _is_text(text)
+    full_date = is_text & (text.str.rsplit('-', n=1).str[-1].str.len() == 4) & text.str.contains('-', regex=False)
+    day_month = is_text & ~full_date & text.str.contains('-', regex=False)
+    parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[us]')
+    parsed[full_date] = pd.to_datetime(text[full_date], format='%d-%m-%Y', errors='coerce')
+    parsed[day_month] = pd.to_datetime(text[day_month] + '-2025', format='%d-%b-%Y', errors='coerce')
+    return parsed
+
+def split_seats_column(seats_available):
+    """split_seats for a whole column: (total_seats, window_seats); anything unparseable gives (0, 0)."""
+    parts = _text(seats_available).str.extract(SEATS_PATTERN)
+    seats, has_window, windows = parts[0], parts[1].notna(), parts[2]
+    valid = seats.notna() & (~has_window | windows.notna())
+    total_seats = seats.where(valid, '0').astype('int64')
+    window_seats = windows.where(valid & has_window, '0').astype('int64')
+    return total_seats, window_seats
+
+def finish_cleaning(df):
+    """Column renames and rating conversion shared by both cleaning paths."""
+    # Drop the original combined 'seats_available' column
+    df.drop(columns=['seats_available'], inplace=True)
+
+    # Rename columns for clarity
+    df.rename(columns={
+        'price': 'price_inr',
+        'star_rating': 'star_rating_out_of_5',
+    }, inplace=True)
+    # Replace 'New' with 0.0 in the 'star_rating_out_of_5' column
+    df['star_rating_out_of_5'] = df['star_rating_out_of_5'].replace('New', 0.0)
 
-#Fetching the Raw Scraped Data from the Backup Database for Cleaning
-select_query="select * from bus_details_backup"
-with engine.connect() as connection:
-    results=connection.execute(text(select_query))
-df=pd.DataFrame(results)
+    # Convert the column to numeric, if not already done
+    df['star_rating_out_of_5'] = pd.to_numeric(df['star_rating_out_of_5'], errors='coerce')
+    return df
 
-# Fetch today's date and format it for PostgreSQL
-today_date = datetime.now().strftime("%d-%m-%Y")
+def scrape_dates(df, today_date=None):
+    """Each row's scrape date from bus_details_backup.departing_date; rows without one get today_date ('dd-mm-YYYY') or today."""
+    fallback = pd.to_datetime(today_date or datetime.now().strftime("%d-%m-%Y"), format='%d-%m-%Y')
+    if 'departing_date' not in df.columns:
+        return pd.Series(fallback, index=df.index).astype('datetime64[us]')
+    return pd.to_datetime(df['departing_date']).fillna(fallback).astype('datetime64[us]')
 
-# Assign it to the DataFrame column
-df['departing_date'] = today_date
+def clean_bus_details_rowwise(df, today_date=None):
+    """The original row-by-row cleaning, kept as the reference clean_bus_details must match."""
+    df = df.copy()
+    # Keep the date each row was scraped on, so recleaning old rows does not re-date them
+    df['departing_date'] = scrape_dates(df, today_date)
+    df['duration'] = df['duration'].apply(clean_duration)
 
-df[['total_seats', 'window_seats']] = df['seats_available'].apply(
-    lambda x: pd.Series(split_seats(x))
-)
+    df[['reaching_time', 'reaching_date']] = df['reaching_time'].apply(
+        lambda x: pd.Series(split_reaching_time(x))
+    )
 
-# Drop the original combined 'seats_available' column
-df.drop(columns=['seats_available'], inplace=True)
+    # Convert 'reaching_date' into datetime format
+    df['reaching_date'] = df['reaching_date'].apply(parse_reaching_date)
 
-# Rename columns for clarity
-df.rename(columns={
-    'price': 'price_inr',
-    'star_rating': 'star_rating_out_of_5',
-}, inplace=True)
-# Replace 'New' with 0.0 in the 'star_rating_out_of_5' column
-df['star_rating_out_of_5'] = df['star_rating_out_of_5'].replace('New', 0.0)
+    df[['total_seats', 'window_seats']] = df['seats_available'].apply(
+        lambda x: pd.Series(split_seats(x))
+    )
+    return finish_cleaning(df)
+
+def clean_bus_details(df, today_date=None):
+    """Clean raw bus_details_backup rows into the bus_routes layout with whole-column operations.
+
+    Produces the same values as clean_bus_details_rowwise, including its fallbacks for malformed rows.
+    """
+    df = df.copy()
+    df['departing_date'] = scrape_dates(df, today_date)
+    df['duration'] = clean_duration_column(df['duration'])
+    df['reaching_time'], reaching_date = split_reaching_time_column(df['reaching_time'])
+    df['reaching_date'] = parse_reaching_date_column(reaching_date)
+    df['total_seats'], df['window_seats'] = split_seats_column(df['seats_available'])
+    return finish_cleaning(df)
+
+def time_of_day_column(times):
+    """'HH:MM' strings as timedelta64 since midnight, NaT when unparseable; COPY writes them as TIME."""
+    parsed = pd.to_timedelta(_text(times).str.strip() + ':00', errors='coerce')
+    return parsed.where(parsed < pd.Timedelta(days=1))
+
+def compact_bus_routes(df):
+    """Typed, compact bus_routes frame from clean_bus_details output.
+
+    duration becomes duration_minutes, the times become timedelta64 since midnight, numbers get
+    32-bit types and the repeated names (plus the agency taken from route_name) become categoricals.
+    """
+    df = df.copy()
+    # route_name is '<agency>_<route>'
+    df.insert(0, 'agency', _text(df['route_name']).str.split('_', n=1).str[0].str.strip())
+    parts = _text(df.pop('duration')).str.extract(DURATION_PATTERN)
+    hours = parts[0].fillna('0').astype('int32')
+    minutes = parts[1].fillna(parts[2]).fillna('0').astype('int32')
+    df['duration_minutes'] = hours * 60 + minutes
+    df['departing_time'] = time_of_day_column(df['departing_time'])
+    df['reaching_time'] = time_of_day_column(df['reaching_time'])
+    df['star_rating_out_of_5'] = df['star_rating_out_of_5'].astype('float32')
+    df['price_inr'] = pd.to_numeric(df['price_inr'], errors='coerce').astype('float32')
+    df['total_seats'] = df['total_seats'].astype('int32')
+    df['window_seats'] = df['window_seats'].astype('int32')
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype('category')
+    return df
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where the resource module is missing."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def read_backup_chunks(engine, chunk_rows=CLEAN_CHUNK_ROWS, table="bus_details_backup", ingested_after=None):
+    """Yield table as DataFrames of at most chunk_rows rows, read through a server-side cursor.
+
+    A named psycopg2 cursor keeps the result set in Postgres, so only the current chunk is in memory.
+    With ingested_after, only rows ingested after that timestamp are read.
+    """
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor(name=f"{table}_cleaning") as cursor:
+            cursor.itersize = chunk_rows
+            if ingested_after is None:
+                cursor.execute(f"SELECT * FROM {table}")
+            else:
+                cursor.execute(f"SELECT * FROM {table} WHERE ingested_at > %s", (ingested_after,))
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=[column[0] for column in cursor.description])
+        connection.rollback()
+    finally:
+        connection.close()
+
+def _report_progress(label, rows, written, started):
+    elapsed = max(sleep_time.perf_counter() - started, 1e-9)
+    peak = peak_rss_mb()
+    print(f"{label}: {rows} rows cleaned, {written} rows inserted or updated in bus_routes, "
+          f"{elapsed:.1f}s ({rows / elapsed:.0f} rows/s)" + ("" if peak is None else f", peak RSS {peak:.0f} MB"))
+
+def last_watermark(engine):
+    """ingested_at of the newest row cleaned by a successful run, or None before the first run."""
+    with engine.connect() as connection:
+        return connection.execute(text("SELECT max(watermark) FROM cleaning_runs")).scalar()
+
+def in_flight_cutoff(engine):
+    """Earliest ingested_at a row committed from now on can still carry.
+
+    Backup rows are stamped with the start of their writing transaction (ingested_at DEFAULT now()),
+    so a transaction still open may commit rows older than everything already visible. The cutoff is
+    the start of the oldest open transaction in this database, or the server clock if there is none.
+    """
+    with engine.connect() as connection:
+        return connection.execute(text("""
+            SELECT least(clock_timestamp(), min(xact_start)) FROM pg_stat_activity
+            WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()
+        """)).scalar()
+
+def count_rows_at_or_before(engine, watermark, table="bus_details_backup"):
+    if watermark is None:
+        return 0
+    with engine.connect() as connection:
+        return connection.execute(
+            text(f"SELECT count(*) FROM {table} WHERE ingested_at <= :watermark"), {"watermark": watermark}
+        ).scalar()
+
+def record_cleaning_run(engine, started_at, watermark, rows_processed, rows_skipped):
+    with engine.begin() as connection:
+        connection.execute(
+            text("""
+            INSERT INTO cleaning_runs (started_at, watermark, rows_processed, rows_skipped)
+            VALUES (:started_at, :watermark, :rows_processed, :rows_skipped)
+            """),
+            {"started_at": started_at, "watermark": watermark, "rows_processed": rows_processed,
+             "rows_skipped": rows_skipped},
+        )
+
+def run_cleaning_job(engine, chunk_rows=CLEAN_CHUNK_ROWS, today_date=None, incremental=True, parquet_stage=None):
+    """Clean bus_details_backup (or the Parquet stage at parquet_stage) into bus_routes one chunk at a time.
+
+    Each chunk is cleaned with clean_bus_details, typed by compact_bus_routes and upserted with COPY
+    before the next one is fetched, so peak memory depends on chunk_rows, not on the size of the input.
+    When incremental, only rows ingested after the last successful run's watermark are read; the run is
+    recorded in cleaning_runs once every chunk is written, so a failed run is simply redone. Returns
+    (rows processed, rows skipped, rows inserted or updated).
+    """
+    create_routes_table(engine)
+    create_cleaning_runs_table(engine)
+    started_at = datetime.now().astimezone()
+    watermark = last_watermark(engine) if incremental else None
+    cutoff = None
+    if parquet_stage is None:
+        source = "bus_details_backup"
+        # Taken before reading: every row that commits after the read is stamped at or after it
+        cutoff = in_flight_cutoff(engine)
+        skipped = count_rows_at_or_before(engine, watermark)
+        raw_chunks = read_backup_chunks(engine, chunk_rows=chunk_rows, ingested_after=watermark)
+    else:
+        source = f"the Parquet stage in {parquet_stage}"
+        skipped = 0 if watermark is None else (
+            count_stage_rows(parquet_stage) - count_stage_rows(parquet_stage, ingested_after=watermark)
+        )
+        raw_chunks = read_parquet_chunks(parquet_stage, chunk_rows=chunk_rows, ingested_after=watermark)
+    print(f"Cleaning rows of {source} ingested after {watermark}, {skipped} older rows skipped"
+          if watermark is not None else f"Cleaning every row of {source}")
 
-# Convert the column to numeric, if not already done
-df['star_rating_out_of_5'] = pd.to_numeric(df['star_rating_out_of_5'], errors='coerce')
+    started = sleep_time.perf_counter()
+    rows = written = chunks = 0
+    newest = watermark
+    for chunk in raw_chunks:
+        if 'ingested_at' in chunk.columns and chunk['ingested_at'].notna().any():
+            chunk_newest = pd.Timestamp(chunk['ingested_at'].max()).to_pydatetime()
+            newest = chunk_newest if newest is None else max(newest, chunk_newest)
+        chunk = chunk.drop(columns=[column for column in INGESTION_COLUMNS if column in chunk.columns])
+        cleaned = compact_bus_routes(clean_bus_details(chunk, today_date=today_date))
+        cleaned = attach_route_ids(engine, cleaned)
+        written += copy_upsert(engine, "bus_routes", cleaned)
+        # Every committed chunk is visible to the frontend, so its cached results are stale from here on
+        bump_data_version(engine)
+        rows += len(chunk)
+        chunks += 1
+        _report_progress(f"Chunk {chunks}", rows, written, started)
+    if cutoff is not None and newest is not None and newest >= cutoff:
+        # Stay below rows an overlapping scraper may still commit; the next run recleans the rest
+        newest = cutoff - timedelta(microseconds=1)
+    record_cleaning_run(engine, started_at, newest, rows, skipped)
+    _report_progress("Cleaning job finished", rows, written, started)
+    print(f"{rows} rows processed, {skipped} rows skipped (already cleaned), watermark now {newest}")
+    return rows, skipped, written
 
-engine = create_engine("postgresql://<username>:<password>@localhost:5432/<db_name>")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean bus_details_backup into the bus_routes table")
+    parser.add_argument("--chunk-rows", type=int, default=CLEAN_CHUNK_ROWS,
+                        help="rows fetched, cleaned and written per chunk (bounds peak memory)")
+    parser.add_argument("--full", dest="incremental", action="store_false",
+                        help="reclean every backup row instead of only those ingested since the last run")
+    parser.add_argument("--parquet-stage", metavar="DIR",
+                        help="read the raw rows from the scraper's Parquet stage instead of bus_details_backup")
+    args = parser.parse_args()
 
-db_loader_cleaned(engine_object_input=engine,df=df)
\ No newline at end of file
+    engine = create_engine("postgresql://<username>:<password>@localhost:5432/<db_name>")
+    run_cleaning_job(engine, chunk_rows=args.chunk_rows, incremental=args.incremental, parquet_stage=args.parquet_stage)
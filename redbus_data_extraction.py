@@ -1,28 +1,82 @@
-import pandas as pd
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver import Firefox
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 import time as sleep_time
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 import streamlit as st
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta, time, timezone
 import re
 import psycopg2
+from redbus_html_parser import parse_bus_cards
+from redbus_lazy_load import load_full_content
+from redbus_row_sink import RowSink
+import redbus_browser
+from redbus_browser import create_browser
+from redbus_crawl_state import (
+    CRAWL_STATE_PATH, MAX_ROUTE_ATTEMPTS, open_crawl_state, reset_crawl_state, save_agencies, load_agencies,
+    mark_agency_done, load_route_links, routes_to_scrape, route_status_counts, mark_route_started,
+    mark_route_done, mark_route_failed, requeue_routes, load_scraped_rows, route_unchanged, route_change_counts,
+    commit_route_fingerprints,
+)
+from redbus_route_index import print_route_index_report
+from redbus_rate_limiter import SCHEDULER, MIN_PAGE_TIMEOUT, looks_like_error_page
+from redbus_tracing import TRACER, TRACE_PATH
+from redbus_page_archive import PageArchive, PAGE_ARCHIVE_DIR, REPARSE_PROCESSES, reparse_archive
+from redbus_bulk_loader import ensure_table, copy_upsert
+from redbus_db_writer import StreamingWriter, STREAM_FLUSH_ROWS, STREAM_FLUSH_SECONDS
+from redbus_parquet_stage import write_parquet_stage, print_stage_footprint
+from redbus_http_fetcher import (
+    extract_travel_links_http, scrape_bus_details_http, record_browser_pages, print_fetch_path_report,
+)
+import argparse
+import functools
+import os
+import queue
+import threading
 
-def popular_travel_agencies_extraction(empty_dictionary_input): # Custom written function for extraction of most popular Travel agencies with a large number of Buses.
-    driver = webdriver.Firefox()
-    driver.get('https://www.redbus.in/')
-    driver.maximize_window()
+# Number of parallel browser workers used by scrape_bus_details_pool (defaults to the core count)
+SCRAPE_WORKERS = int(os.environ.get("REDBUS_SCRAPE_WORKERS", os.cpu_count() or 1))
+# How many times a pool worker may relaunch a crashed browser before giving up
+MAX_BROWSER_RESTARTS = 3
 
-    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CLASS_NAME, 'rtcName')))
+# Scroll passes used to trigger lazy loading: (label, key, seconds to wait for new content per press)
+SCROLL_PASSES = [
+    ("arrow up", Keys.ARROW_UP, 0.2),
+    ("end", Keys.CONTROL + Keys.END, 1.0),
+    ("arrow up", Keys.ARROW_UP, 0.2),
+]
+
+REDBUS_HOME_URL = 'https://www.redbus.in/'
+
+# Stamped on every bus_details_backup row this process writes; Postgres stamps the write time in ingested_at
+SCRAPE_RUN_ID = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+BUS_DETAILS_COLUMNS = ['route_name', 'route_link', 'bus_name', 'bus_type', 'departing_time', 'duration','reaching_time', 'star_rating', 'price', 'seats_available']
+
+def load_page(driver, url, wait_for):
+    """driver.get through the adaptive scheduler, then wait for the wait_for locator.
+
+    The wait replaces fixed sleeps and its timeout follows the host's observed latency; timeouts and
+    throttling pages are fed back to the scheduler, which slows the crawl down for that host.
+    """
+    with SCHEDULER.request(url) as slot:
+        driver.get(url)
+        if looks_like_error_page(driver.title):
+            slot.error_page()
+        WebDriverWait(driver, SCHEDULER.page_timeout(url)).until(EC.presence_of_element_located(wait_for))
+
+def popular_travel_agencies_extraction(empty_dictionary_input, home_url=REDBUS_HOME_URL): # Custom written function for extraction of most popular Travel agencies with a large number of Buses.
+    driver = create_browser()
+    with TRACER.span("page_load", page="home"):
+        load_page(driver, home_url, (By.CLASS_NAME, 'rtcName'))
     popular_bus_depts = driver.find_elements(By.CLASS_NAME, 'rtcName')
     view_buses_buttons = driver.find_element(By.XPATH, "/html/body/section/div[2]/main/div[3]/div[3]/div[1]/div[2]/a")
     popular_bus_names = [bus.text for bus in popular_bus_depts] 
-    driver.get(view_buses_buttons.get_attribute('href'))
-    WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located((By.CLASS_NAME, 'D113_link')))
+    with TRACER.span("page_load", page="agency_index"):
+        load_page(driver, view_buses_buttons.get_attribute('href'), (By.CLASS_NAME, 'D113_link'))
     bus_depts = driver.find_elements(By.CLASS_NAME, 'D113_link')
     for bus in bus_depts:
         for name in popular_bus_names:
@@ -31,13 +85,11 @@ def popular_travel_agencies_extraction(empty_dictionary_input): # Custom written
     driver.quit()
     return empty_dictionary_input
 
-def extract_travel_links(links_dict, d113_bus_dict):
+def extract_travel_links(links_dict, d113_bus_dict, max_successful_agencies=10, crawl_state=None):
 
-    driver = webdriver.Firefox()
-    driver.maximize_window()
+    driver = create_browser()
 
     successful_travel_agencies = 0  # Counter for successful travel agencies
-    max_successful_agencies = 10  # Set a maximum limit for processing
 
     for name_string, link in d113_bus_dict.items():
         if successful_travel_agencies >= max_successful_agencies:
@@ -45,254 +97,482 @@ def extract_travel_links(links_dict, d113_bus_dict):
             break  # Exit if the maximum limit is reached
 
         try:
-            driver.get(link)
-            sleep_time.sleep(2)
+            # Load the agency page and wait for the route elements to be present
+            with TRACER.span("page_load", agency=name_string):
+                load_page(driver, link, (By.CLASS_NAME, "route"))
             body = driver.find_element(By.TAG_NAME, "body")
+            # Pagination tabs are rendered with the routes, so a short wait is enough
+            pagination_timeout = max(MIN_PAGE_TIMEOUT, SCHEDULER.page_timeout(link) / 2)
             
-            # Wait for the route elements to be present
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "route"))
-            )
-            
-            try:
-                # Check if pagination exists
-                parent_div = driver.find_element(By.CLASS_NAME, "DC_117_paginationTable")
-                
+            with TRACER.span("pagination", agency=name_string):
                 try:
-                    # Try to find pagination buttons
-                    WebDriverWait(driver, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "div.DC_117_pageTabs"))
-                    )
+                    # Check if pagination exists
+                    parent_div = driver.find_element(By.CLASS_NAME, "DC_117_paginationTable")
+                
+                    try:
+                        # Try to find pagination buttons
+                        WebDriverWait(driver, pagination_timeout).until(
+                            EC.presence_of_element_located((By.CSS_SELECTOR, "div.DC_117_pageTabs"))
+                        )
                     
-                    child_count = driver.execute_script(
-                        "return arguments[0].getElementsByTagName('div').length;", parent_div
-                    )
+                        child_count = driver.execute_script(
+                            "return arguments[0].getElementsByTagName('div').length;", parent_div
+                        )
                     
-                    # If buttons are found, iterate through pagination
-                    for i in range(1, child_count + 1):
-                        try:
-                            button = driver.find_element(By.CSS_SELECTOR, f"div.DC_117_pageTabs:nth-child({i})")
-                            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
-                            driver.execute_script("arguments[0].click();", button)
+                        # If buttons are found, iterate through pagination
+                        for i in range(1, child_count + 1):
+                            try:
+                                button = driver.find_element(By.CSS_SELECTOR, f"div.DC_117_pageTabs:nth-child({i})")
+                                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
+                                driver.execute_script("arguments[0].click();", button)
                             
-                            # Extract route details on each page
-                            route_details = WebDriverWait(driver, 5).until(
-                                EC.presence_of_all_elements_located((By.CLASS_NAME, 'route'))
-                            )
-                            for route in route_details:
-                                route_link = route.get_attribute('href')
-                                travels_links_dict[name_string + '_' + route.text] = route_link
+                                # Extract route details on each page
+                                route_details = WebDriverWait(driver, pagination_timeout).until(
+                                    EC.presence_of_all_elements_located((By.CLASS_NAME, 'route'))
+                                )
+                                for route in route_details:
+                                    route_link = route.get_attribute('href')
+                                    links_dict[name_string + '_' + route.text] = route_link
                         
-                        except Exception as e:
-                            print(f"Error while clicking pagination button {i}: {e}")
-                            continue  # Skip to the next button if click fails
+                            except Exception as e:
+                                TRACER.exception(e, "pagination", agency=name_string, button=i)
+                                print(f"Error while clicking pagination button {i}: {e}")
+                                continue  # Skip to the next button if click fails
                         
-                except TimeoutException:
-                    # If buttons aren't found but parent div exists, get routes from current page
-                    print(f"Pagination buttons not found for travel agency '{name_string}'. Extracting from current page...")
+                    except TimeoutException:
+                        # If buttons aren't found but parent div exists, get routes from current page
+                        print(f"Pagination buttons not found for travel agency '{name_string}'. Extracting from current page...")
+                        route_details = driver.find_elements(By.CLASS_NAME, 'route')
+                        for route in route_details:
+                            route_link = route.get_attribute('href')
+                            links_dict[name_string + '_' + route.text] = route_link
+                    
+                except NoSuchElementException:
+                    # If pagination table doesn't exist, get routes from current page
+                    print(f"No pagination found for travel agency '{name_string}'. Extracting from current page...")
                     route_details = driver.find_elements(By.CLASS_NAME, 'route')
                     for route in route_details:
                         route_link = route.get_attribute('href')
-                        travels_links_dict[name_string + '_' + route.text] = route_link
-                    
-            except NoSuchElementException:
-                # If pagination table doesn't exist, get routes from current page
-                print(f"No pagination found for travel agency '{name_string}'. Extracting from current page...")
-                route_details = driver.find_elements(By.CLASS_NAME, 'route')
-                for route in route_details:
-                    route_link = route.get_attribute('href')
-                    travels_links_dict[name_string + '_' + route.text] = route_link
+                        links_dict[name_string + '_' + route.text] = route_link
                 
+            # Checkpoint this agency's routes so a resumed run does not revisit it
+            if crawl_state is not None:
+                agency_links = {key: value for key, value in links_dict.items() if key.startswith(name_string + '_')}
+                mark_agency_done(crawl_state, name_string, agency_links)
+
             # Increment successful travel agencies and print success
             successful_travel_agencies += 1
             print(f"Success #{successful_travel_agencies}: Processed travel agency '{name_string}'")
 
         except Exception as e:
+            TRACER.exception(e, "agency", agency=name_string)
             print(f"Error occurred while processing travel agency '{name_string}': {e}. Skipping...")
             continue  # Skip to the next travel agency
 
     driver.quit()
     print(f"Total successful travel agencies processed: {successful_travel_agencies}")
-    return travels_links_dict
-
-def parse_bus_details(details_box, df, route_name, route_link):
-    for element in details_box:
-        try:
-            # Bus name
-            bus_name = element.find_element("css selector", ".travels").text
-            
-            # Bus type
-            bus_type = element.find_element("css selector", ".bus-type.f-12").text
-            
-            # Departure time
-            departure_time = element.find_element("css selector", ".dp-time.f-19").text
-            
-            # Duration
-            duration = element.find_element("css selector", ".dur.l-color").text
-            
-            # Arrival time + date
-            arrival_time = element.find_element("css selector", ".bp-time.f-19").text
-            try:
-                next_day = element.find_element("css selector", ".next-day-dp-lbl").text
-                arrival_datetime = f"{arrival_time} ({next_day})"
-            except:
-                arrival_datetime = arrival_time
-            
-            # Rating - handles both numeric and "New"
-            try:
-                rating_element = element.find_element("css selector", ".lh-18.rating span")
-                rating = rating_element.text
-            except:
-                try:
-                    rating = element.find_element("css selector", ".rate_count").text
-                except:
-                    rating = "N/A"
-            
-            # Price
-            price = element.find_element("css selector", ".fare .f-19").text
-            
-            # Available seats and window seats
-            try:
-                seats = element.find_element("css selector", ".seat-left").text.split()[0]
-            except:
-                seats = "0"
-                
-            # Window seats - with null handling
-            try:
-                window_seats = element.find_element("css selector", ".window-left").text.split()[0]
-                seats_info = f"{seats} Seats | {window_seats} Window"
-            except:
-                seats_info = f"{seats} Seats"
-            
-            # Create new row data
-            new_row = {
-                'route_name': route_name,
-                'route_link': route_link,
-                'bus_name': bus_name,
-                'bus_type': bus_type,
-                'departing_time': departure_time,
-                'duration': duration,
-                'reaching_time': arrival_datetime,
-                'star_rating': rating,
-                'price': price,
-                'seats_available': seats_info
-            }
-            
-            # Append the new row to the DataFrame
-            df.loc[len(df)] = new_row
-            
-        except Exception as e:
-            print(f"Error parsing bus details: {e}")
-            continue
-    
-    return df
+    return links_dict
 
-def scrape_bus_details(links_dict,df):
-    driver = webdriver.Firefox()
-    driver.maximize_window()
+def parse_bus_details(page_source, sink, route_name, route_link):
+    """Append every bus card in a page_source snapshot to a RowSink.
 
-    print(f"Starting to process {len(travels_links_dict)} routes...")
+    The snapshot is parsed with compiled lxml selectors (redbus_html_parser) instead of one
+    WebDriver round-trip per field, so a route costs a single page_source call.
+    """
+    sink.extend(parse_bus_cards(page_source, route_name, route_link))
+    return sink
 
-    for index, (route_name, route_link) in enumerate(travels_links_dict.items(), 1):
-        print(f"\nProcessing route {index}/{len(travels_links_dict)}: {route_name}")
-        
-        try:
-            driver.get(route_link)
-            driver.maximize_window()
-            sleep_time.sleep(10)
+def scrape_route(driver, route_name, route_link, sink, archive=None):
+    """Load a single route page, scroll until every bus is rendered and append its buses to sink.
 
-            # Wait for the 'View Buses' button
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CLASS_NAME, 'button')))
+    The rendered HTML is kept in archive (a PageArchive) when one is given, so it can be reparsed later.
+    Returns True when the route was parsed, False when an error was printed and skipped.
+    """
+    try:
+        # Load the route and wait for the 'View Buses' button
+        with TRACER.span("page_load", route=route_name):
+            load_page(driver, route_link, (By.CLASS_NAME, 'button'))
             driver.back()
 
-            body = driver.find_element(By.TAG_NAME, "body")
-            body.send_keys(Keys.PAGE_DOWN)
+        body = driver.find_element(By.TAG_NAME, "body")
+        body.send_keys(Keys.PAGE_DOWN)
 
-            # Click "View Buses" buttons
+        # Click "View Buses" buttons
+        with TRACER.span("view_buses", route=route_name):
             view_buses_buttons = [driver.find_elements(By.CLASS_NAME, "button")]
             for button in view_buses_buttons[0]:
                 if button.text == "View Buses" or button.text == "VIEW BUSES":
                     button.click()
                     print("View Buses button clicked successfully")
 
-            print("Starting content loading process...")
-            # Scroll to load full content
-            scrolling = True
-            while scrolling:
-                old_page_source = driver.page_source
-                body.send_keys(Keys.ARROW_UP)
-                new_page_source = driver.page_source
-                if new_page_source == old_page_source:
-                    scrolling = False
-
-            scrolling = True
-            while scrolling:
-                old_page_source = driver.page_source
-                body.send_keys(Keys.CONTROL + Keys.END)
-                sleep_time.sleep(1)
-                new_page_source = driver.page_source
-                if new_page_source == old_page_source:
-                    scrolling = False
-
-            scrolling = True
-            while scrolling:
-                old_page_source = driver.page_source
-                body.send_keys(Keys.ARROW_UP)
-                new_page_source = driver.page_source
-                if new_page_source == old_page_source:
-                    scrolling = False
-
-            print("Content fully loaded, parsing bus details...")
-            details_box = driver.find_elements(By.XPATH, "//div[contains(@class, 'clearfix') and contains(@class, 'row-one')]")
-            bus_details = parse_bus_details(details_box=details_box,df=df,route_link=route_link,route_name=route_name)
-            print(f"Found {len(details_box)} buses for this route")
+        print("Starting content loading process...")
+        # Scroll to load full content, watching a cheap load signal instead of diffing page_source
+        with TRACER.span("lazy_load", route=route_name):
+            load_report = load_full_content(driver, body, SCROLL_PASSES)
+        print(f"Lazy loading settled after {load_report['iterations']} iterations in {load_report['seconds']:.2f}s")
 
-        except Exception as e:
-            print(f"Error processing route {route_name}: {str(e)}")
-            continue
+        print("Content fully loaded, parsing bus details...")
+        rows_before = len(sink)
+        page_source = driver.page_source
+        with TRACER.span("parse", route=route_name):
+            parse_bus_details(page_source=page_source,sink=sink,route_link=route_link,route_name=route_name)
+        if archive is not None:
+            with TRACER.span("archive", route=route_name):
+                archive.store(route_name, route_link, page_source, source="browser")
+        print(f"Found {len(sink) - rows_before} buses for this route")
+        return True
+
+    except Exception as e:
+        TRACER.exception(e, "route", route=route_name)
+        print(f"Error processing route {route_name}: {str(e)}")
+        return False
 
-    print("\nScraping completed. Final DataFrame size:", len(df))
+def finish_route(crawl_state, route_name, parsed, route_rows, writer=None):
+    """Checkpoint a finished route and, in streaming mode, hand its rows to the database writer.
+
+    With a crawl state the rows are also fanned out to every other label of the same page.
+    """
+    labelled_rows = {route_name: route_rows}
+    if not parsed:
+        TRACER.count("route_failed", route=route_name)
+    if crawl_state is not None:
+        with TRACER.span("checkpoint", route=route_name):
+            if parsed:
+                labelled_rows = mark_route_done(crawl_state, route_name, route_rows)
+            else:
+                mark_route_failed(crawl_state, route_name)
+    if writer is not None and parsed:
+        for label_rows in labelled_rows.values():
+            writer.put(label_rows)
+
+def scrape_bus_details(links_dict,sink,crawl_state=None,writer=None,archive=None):
+    """Scrape every route with one browser. Rows go to sink, or straight to writer when streaming.
+
+    sink may be None when the rows are read back from crawl_state instead.
+    """
+    driver = create_browser()
+
+    print(f"Starting to process {len(links_dict)} routes...")
+
+    rows_scraped = 0
+    for index, (route_name, route_link) in enumerate(links_dict.items(), 1):
+        print(f"\nProcessing route {index}/{len(links_dict)}: {route_name}")
+        if crawl_state is not None:
+            mark_route_started(crawl_state, route_name)
+        route_sink = RowSink(BUS_DETAILS_COLUMNS)
+        parsed = scrape_route(driver, route_name, route_link, route_sink, archive)
+        route_rows = route_sink.rows()
+        finish_route(crawl_state, route_name, parsed, route_rows, writer)
+        if writer is None and sink is not None:
+            sink.extend(route_rows)
+        rows_scraped += len(route_rows)
+
+    print("\nScraping completed. Total rows scraped:", rows_scraped)
     driver.quit()
-    return df
+    return sink
+
+def browser_is_alive(driver):
+    """Cheap liveness probe: a crashed browser or dead session raises on any command."""
+    try:
+        driver.title
+        return True
+    except Exception:
+        return False
+
+def _pool_worker(worker_id, route_queue, route_results, rows_lock, total_routes, crawl_state=None, writer=None, archive=None):
+    """Pull routes off the shared queue with a dedicated headless browser until the queue is empty."""
+    driver = create_browser(headless=True)
+    restarts = 0
+    routes_done = 0
+    buses_found = 0
+    started = sleep_time.time()
+
+    while True:
+        try:
+            index, route_name, route_link = route_queue.get_nowait()
+        except queue.Empty:
+            break
+
+        print(f"[worker {worker_id}] Processing route {index + 1}/{total_routes}: {route_name}")
+        if crawl_state is not None:
+            mark_route_started(crawl_state, route_name)
+        route_sink = RowSink(BUS_DETAILS_COLUMNS)
+        parsed = scrape_route(driver, route_name, route_link, route_sink, archive)
+
+        # A failed route on a dead browser is a crash, not a page problem: relaunch and retry it once
+        if not parsed and not browser_is_alive(driver) and restarts < MAX_BROWSER_RESTARTS:
+            restarts += 1
+            TRACER.count("browser_restart", worker=worker_id, route=route_name)
+            print(f"[worker {worker_id}] Browser crashed, restarting ({restarts}/{MAX_BROWSER_RESTARTS})...")
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            driver = create_browser(headless=True)
+            route_sink = RowSink(BUS_DETAILS_COLUMNS)
+            parsed = scrape_route(driver, route_name, route_link, route_sink, archive)
+
+        route_rows = route_sink.rows()
+        finish_route(crawl_state, route_name, parsed, route_rows, writer)
+        if writer is None and route_results is not None:
+            with rows_lock:
+                route_results[index] = route_rows
+        routes_done += 1
+        buses_found += len(route_rows)
+
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+    elapsed = max(sleep_time.time() - started, 1e-9)
+    print(f"[worker {worker_id}] Finished {routes_done} routes, {buses_found} buses in {elapsed:.1f}s "
+          f"({routes_done / elapsed * 60:.2f} routes/min, {buses_found / elapsed:.2f} buses/s, {restarts} restarts)")
+
+def scrape_bus_details_pool(links_dict, sink, workers=SCRAPE_WORKERS, crawl_state=None, writer=None, archive=None):
+    """Parallel version of scrape_bus_details: N headless browsers share the route list.
 
-def db_loader(engine_object_input,df):
+    Rows are appended to sink in the original route order, so the result matches a serial run.
+    When streaming, each worker hands its routes to writer as they finish instead. With sink=None
+    the rows are only checkpointed in crawl_state.
+    """
+    routes = list(links_dict.items())
+    workers = max(1, min(workers, len(routes)))
+    print(f"Starting to process {len(routes)} routes with {workers} browser workers...")
+
+    route_queue = queue.Queue()
+    for index, (route_name, route_link) in enumerate(routes):
+        route_queue.put((index, route_name, route_link))
+
+    route_results = {} if sink is not None else None
+    rows_lock = threading.Lock()
+    threads = [
+        threading.Thread(target=_pool_worker, args=(worker_id, route_queue, route_results, rows_lock, len(routes), crawl_state, writer, archive), daemon=True)
+        for worker_id in range(1, workers + 1)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for index in sorted(route_results or {}):
+        sink.extend(route_results[index])
+    print("\nScraping completed.")
+    return sink
+
+def create_backup_table(engine_object_input):
+    # Raw scraped values, one TEXT column per scraped field; redbus_data_cleaning types them.
+    # departing_date is the scrape date and completes the natural key used for upserts.
+    # scrape_run_id/ingested_at record which run last wrote a row and when (the cleaning watermark).
     create_table_query = """
-    CREATE TABLE bus_details_backup (
+    CREATE TABLE IF NOT EXISTS bus_details_backup (
         route_name TEXT,
         route_link TEXT,
         bus_name TEXT,
         bus_type TEXT,
-        departing_time TIME,
+        departing_time TEXT,
         duration TEXT,
-        reaching_time TIME,
-        star_rating_out_of_5 NUMERIC(2, 1),
-        price_inr NUMERIC(10, 2),
-        total_seats INTEGER,
-        window_seats INTEGER,
-        departing_date DATE,
-        reaching_date DATE
+        reaching_time TEXT,
+        star_rating TEXT,
+        price TEXT,
+        seats_available TEXT,
+        departing_date DATE DEFAULT CURRENT_DATE,
+        scrape_run_id TEXT,
+        ingested_at TIMESTAMPTZ DEFAULT now()
     );
-
+    ALTER TABLE bus_details_backup ADD COLUMN IF NOT EXISTS departing_date DATE DEFAULT CURRENT_DATE;
+    ALTER TABLE bus_details_backup ADD COLUMN IF NOT EXISTS scrape_run_id TEXT;
+    ALTER TABLE bus_details_backup ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMPTZ DEFAULT now();
+    CREATE INDEX IF NOT EXISTS bus_details_backup_ingested_at ON bus_details_backup (ingested_at);
     """
 
-    # Execute the query using the engine
-    with engine_object_input.connect() as connection:
-        connection.execute(text(create_table_query))
-        connection.commit()
+    ensure_table(engine_object_input, create_table_query, "bus_details_backup")
+    print("Table ready!")
 
-    print("Table created successfully!")
+def write_backup_rows(engine, table, frame, parquet_stage=None, database=True):
+    """copy_upsert with this run's ingestion metadata, plus the same rows as Parquet when parquet_stage is set.
+
+    ingested_at is part of the update, so a re-scraped row moves past the cleaner's watermark again.
+    In Postgres it is the column default, the start of the writing transaction on the server, which
+    the cleaner compares against transactions still in flight (see redbus_data_cleaning.in_flight_cutoff).
+    With database=False only the Parquet stage is written and no Postgres is needed.
+    """
+    frame = frame.assign(scrape_run_id=SCRAPE_RUN_ID)
+    written = len(frame)
+    if parquet_stage is not None:
+        with TRACER.span("parquet_write", rows=len(frame)):
+            write_parquet_stage(frame.assign(ingested_at=datetime.now(timezone.utc)), parquet_stage, run_id=SCRAPE_RUN_ID)
+    if database:
+        written = copy_upsert(engine, table, frame, default_columns=['ingested_at'])
+    return written
+
+def db_loader(engine_object_input,df, parquet_stage=None, database=True):
+    if database:
+        create_backup_table(engine_object_input)
     try:
-        df.to_sql("bus_details_backup", engine_object_input, if_exists="append", index=False)
-        print("Data inserted successfully!")
+        with TRACER.span("db_write", table="bus_details_backup", rows=len(df)):
+            merged = write_backup_rows(engine_object_input, "bus_details_backup", df,
+                                       parquet_stage=parquet_stage, database=database)
+        print(f"Data inserted successfully! {merged} rows inserted or updated")
+        return True
     except Exception as e:
         print("Error:", e)
+        return False
+
+def db_loader_from_archive(engine_object_input, archive, processes=REPARSE_PROCESSES, crawled_before=None, links_dict=None,
+                           parquet_stage=None, database=True):
+    """Rebuild bus_details_backup from archived pages: no browser, parsing spread over processes."""
+    reparsed_rows = RowSink(BUS_DETAILS_COLUMNS + ['departing_date'])
+    with TRACER.span("reparse"):
+        reparsed_rows.extend(reparse_archive(archive, processes=processes, crawled_before=crawled_before, links_dict=links_dict))
+    return db_loader(engine_object_input, reparsed_rows.to_frame(), parquet_stage=parquet_stage, database=database)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape RedBus routes into the bus_details_backup table")
+    parser.add_argument("--workers", type=int, default=SCRAPE_WORKERS,
+                        help="number of parallel headless browsers (1 runs the original serial scraper)")
+    parser.add_argument("--browser-mode", choices=["lean", "full"], default=redbus_browser.BROWSER_MODE,
+                        help="lean: headless with images/media/fonts/trackers blocked; full: the original visible browser")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the checkpointed crawl: skip finished agencies/routes and retry failed routes")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ROUTE_ATTEMPTS,
+                        help="stop retrying a route after this many failed or interrupted attempts")
+    parser.add_argument("--no-http-first", dest="http_first", action="store_false",
+                        help="always render pages in Firefox instead of trying plain HTTP first")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only write routes whose bus list changed since the last successful load")
+    parser.add_argument("--stream", action="store_true",
+                        help="write rows to bus_details_backup in batches while scraping instead of once at the end; "
+                             "routes whose batch fails to write are re-queued for the next --resume")
+    parser.add_argument("--flush-rows", type=int, default=STREAM_FLUSH_ROWS,
+                        help="streaming: flush after this many buffered rows")
+    parser.add_argument("--flush-seconds", type=float, default=STREAM_FLUSH_SECONDS,
+                        help="streaming: flush at least this often")
+    parser.add_argument("--scheduler-report-seconds", type=float, default=60,
+                        help="how often to print the live per-host rate and concurrency")
+    parser.add_argument("--state-path", default=CRAWL_STATE_PATH, help="SQLite file holding the crawl checkpoint")
+    parser.add_argument("--no-archive", dest="archive", action="store_false",
+                        help="do not keep the raw HTML of scraped route pages")
+    parser.add_argument("--archive-path", default=PAGE_ARCHIVE_DIR,
+                        help="directory of the content-addressed, zstd-compressed page archive")
+    parser.add_argument("--reparse", action="store_true",
+                        help="rebuild bus_details_backup from the page archive with the current parser, without a browser")
+    parser.add_argument("--reparse-processes", type=int, default=REPARSE_PROCESSES,
+                        help="reparse: number of parser processes")
+    parser.add_argument("--reparse-before", metavar="ISO_TIME",
+                        help="reparse: use the newest snapshot of each route taken at or before this time")
+    parser.add_argument("--trace-path", default=TRACE_PATH,
+                        help="JSONL file receiving one record per timed stage (empty string to disable)")
+    parser.add_argument("--parquet-stage", metavar="DIR",
+                        help="also write the raw rows as Parquet partitioned by run date and agency")
+    parser.add_argument("--no-db", dest="database", action="store_false",
+                        help="with --parquet-stage: skip bus_details_backup, so no Postgres is needed")
+    args = parser.parse_args()
+    if not args.database and not args.parquet_stage:
+        parser.error("--no-db needs --parquet-stage")
+    redbus_browser.BROWSER_MODE = args.browser_mode
+    SCHEDULER.start_reporter(interval=args.scheduler_report_seconds)
+    # Per-stage timings, retries and exceptions, summarised at the end of the run
+    TRACER.open(args.trace_path)
+    # Raw route pages are kept so a parser or cleaning fix can be replayed without a re-crawl
+    archive = PageArchive(args.archive_path) if args.archive or args.reparse else None
+
+    if args.reparse:
+        engine = create_engine("postgresql://<username>:<password>@localhost:5432/<db_name>")
+        # Route labels from the last crawl let rows fan out to every label of a shared page again
+        crawl_links = load_route_links(open_crawl_state(args.state_path)) if os.path.exists(args.state_path) else None
+        db_loader_from_archive(engine, archive, processes=args.reparse_processes,
+                               crawled_before=args.reparse_before, links_dict=crawl_links,
+                               parquet_stage=args.parquet_stage, database=args.database)
+        archive.print_footprint()
+        if args.parquet_stage:
+            print_stage_footprint(args.parquet_stage)
+        TRACER.close()
+        raise SystemExit(0)
+
+    # Every discovered agency, route link and scraped route is checkpointed so a crashed crawl can resume
+    crawl_state = open_crawl_state(args.state_path)
+    if not args.resume:
+        reset_crawl_state(crawl_state)
+
+    d113_bus_dict = load_agencies(crawl_state)
+    if not d113_bus_dict:
+        d113_bus_dict = popular_travel_agencies_extraction(empty_dictionary_input={})
+        save_agencies(crawl_state, d113_bus_dict)
+
+    max_successful_agencies = 10
+    done_agencies = len(load_agencies(crawl_state, status='done'))
+    if done_agencies < max_successful_agencies:
+        pending_agencies = load_agencies(crawl_state, status='pending')
+        remaining_agencies = max_successful_agencies - done_agencies
+        if args.http_first:
+            # Server-rendered agency pages are parsed straight from HTTP; only JS-paginated ones need Firefox
+            _, browser_agencies, http_agencies = extract_travel_links_http(
+                {}, pending_agencies, max_successful_agencies=remaining_agencies, crawl_state=crawl_state
+            )
+            remaining_agencies -= http_agencies
+            pending_agencies = load_agencies(crawl_state, status='pending')
+            # Agencies HTTP could not serve go first, then the ones HTTP never reached
+            pending_agencies = {**browser_agencies, **pending_agencies}
+        if remaining_agencies > 0 and pending_agencies:
+            record_browser_pages(min(len(pending_agencies), remaining_agencies))
+            extract_travel_links(links_dict={}, d113_bus_dict=pending_agencies,
+                                 max_successful_agencies=remaining_agencies, crawl_state=crawl_state)
+    travel_links_dict = load_route_links(crawl_state)
+    print(travel_links_dict)
+    # The same route page often appears under several agencies/tabs; each page is visited once
+    print_route_index_report(travel_links_dict)
+
+    pending_routes = routes_to_scrape(crawl_state, max_attempts=args.max_attempts)
+    print(f"{len(pending_routes)} unique route pages to scrape")
+    engine = create_engine("postgresql://<username>:<password>@localhost:5432/<db_name>")
+    writer = None
+    if args.stream:
+        # Rows reach bus_details_backup while the crawl runs instead of in one write at the end
+        if args.database:
+            create_backup_table(engine)
+        writer = StreamingWriter(
+            engine, BUS_DETAILS_COLUMNS, flush_rows=args.flush_rows, flush_seconds=args.flush_seconds,
+            write=functools.partial(write_backup_rows, parquet_stage=args.parquet_stage, database=args.database),
+            route_filter=(lambda route_name: not route_unchanged(crawl_state, route_name)) if args.incremental else None,
+        )
+
+    if args.http_first:
+        # Route pages whose full bus list is in the server-rendered HTML skip the browser entirely
+        _, pending_routes = scrape_bus_details_http(pending_routes, crawl_state=crawl_state, writer=writer, archive=archive)
+    record_browser_pages(len(pending_routes))
+    print_fetch_path_report()
+
+    # Rows are checkpointed in the crawl state and loaded from there (or streamed), so no sink is kept
+    if args.workers > 1:
+        scrape_bus_details_pool(links_dict=pending_routes, sink=None, workers=args.workers, crawl_state=crawl_state, writer=writer, archive=archive)
+    else:
+        scrape_bus_details(links_dict=pending_routes, sink=None, crawl_state=crawl_state, writer=writer, archive=archive)
+    print(f"Route status: {route_status_counts(crawl_state)}")
+
+    change_counts = route_change_counts(crawl_state)
+    print(f"Route changes since the last load: {change_counts['unchanged']} unchanged, {change_counts['changed']} changed, "
+          f"{change_counts['new']} new, {change_counts['gone']} gone")
+
+    if writer is not None:
+        loaded = writer.close()
+        if writer.failed_routes:
+            # Those routes are marked done but their rows were lost; a --resume run scrapes them again
+            requeued = requeue_routes(crawl_state, writer.failed_routes)
+            print(f"{requeued} route labels whose rows could not be written are pending again; rerun with --resume")
+    else:
+        # In incremental mode routes whose card list matches the last load are not written again
+        scraped_rows = RowSink(BUS_DETAILS_COLUMNS)
+        scraped_rows.extend(load_scraped_rows(crawl_state, changed_only=args.incremental))
+        loaded = db_loader(engine_object_input=engine,df=scraped_rows.to_frame(),
+                           parquet_stage=args.parquet_stage, database=args.database)
+    if loaded:
+        commit_route_fingerprints(crawl_state)
+    if args.parquet_stage:
+        print_stage_footprint(args.parquet_stage)
 
-d113_bus_dict={}
-travel_links_dict={}
-d113_bus_dict=popular_travel_agencies_extraction(empty_dictionary_input=d113_bus_dict)
-travel_links_dict=extract_travel_links(links_dict=travel_links_dict,d113_bus_dict=d113_bus_dict)
-print(travel_links_dict)
-df = pd.DataFrame(columns=['route_name', 'route_link', 'bus_name', 'bus_type', 'departing_time', 'duration','reaching_time', 'star_rating', 'price', 'seats_available'])
-df = scrape_bus_details(links_dict=travels_links_dict, df=df)
-engine = create_engine("postgresql://<username>:<password>@localhost:5432/<db_name>")
-db_loader(engine_object_input=engine,df=df)
\ No newline at end of file
+    if archive is not None:
+        archive.print_footprint()
+        archive.close()
+    TRACER.print_summary()
+    TRACER.close()
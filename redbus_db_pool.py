@@ -0,0 +1,122 @@
+import os
+import threading
+import time as sleep_time
+from collections import deque
+from contextlib import contextmanager
+import psycopg2
+
+# Connections opened up front and the most that may be open at once (sessions beyond that wait)
+POOL_MIN_SIZE = int(os.environ.get("REDBUS_DB_POOL_MIN", 1))
+POOL_MAX_SIZE = int(os.environ.get("REDBUS_DB_POOL_MAX", 10))
+# An idle connection older than this is checked with SELECT 1 before it is handed out again
+POOL_HEALTH_CHECK_SECONDS = float(os.environ.get("REDBUS_DB_POOL_HEALTH_CHECK_SECONDS", 30))
+# How long a caller waits for a free connection before giving up
+POOL_ACQUIRE_TIMEOUT = float(os.environ.get("REDBUS_DB_POOL_ACQUIRE_TIMEOUT", 10))
+
+class ConnectionPool:
+    """A bounded set of psycopg2 connections shared by every thread (every Streamlit session) of the process.
+
+    min_size connections are opened immediately; more are opened on demand up to max_size, after which
+    callers block until one is returned. A connection that is closed, or that fails a SELECT 1 after
+    sitting idle for health_check_seconds, is discarded and replaced. Connections go back to the pool
+    with their transaction rolled back.
+    """
+
+    def __init__(self, connect, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 health_check_seconds=POOL_HEALTH_CHECK_SECONDS, acquire_timeout=POOL_ACQUIRE_TIMEOUT):
+        self._connect = connect
+        self.max_size = max_size
+        self.health_check_seconds = health_check_seconds
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        # (connection, monotonic time it was returned), most recently used on the right
+        self._idle = deque()
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+        self.waits = 0
+        for _ in range(min(min_size, max_size)):
+            self._idle.append((self._open(), sleep_time.monotonic()))
+
+    def _open(self):
+        connection = self._connect()
+        with self._lock:
+            self.opened += 1
+        return connection
+
+    def _discard(self, connection):
+        with self._lock:
+            self.discarded += 1
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def _healthy(self, connection, idle_since):
+        if connection.closed:
+            return False
+        if sleep_time.monotonic() - idle_since < self.health_check_seconds:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, idle_since = self._idle.pop()
+            if self._healthy(connection, idle_since):
+                with self._lock:
+                    self.reused += 1
+                return connection
+            self._discard(connection)
+        return self._open()
+
+    def _checkin(self, connection):
+        if connection.closed:
+            self._discard(connection)
+            return
+        try:
+            connection.rollback()
+        except psycopg2.Error:
+            self._discard(connection)
+            return
+        with self._lock:
+            self._idle.append((connection, sleep_time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ... ; raises TimeoutError when no connection frees up in time."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            if not self._slots.acquire(timeout=self.acquire_timeout):
+                raise TimeoutError(f"no database connection free after {self.acquire_timeout}s (pool size {self.max_size})")
+        try:
+            connection = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        try:
+            yield connection
+        finally:
+            self._checkin(connection)
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {"idle": len(self._idle), "opened": self.opened, "reused": self.reused,
+                    "discarded": self.discarded, "waits": self.waits}
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _ in idle:
+            connection.close()
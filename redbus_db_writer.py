@@ -0,0 +1,98 @@
+import os
+import queue
+import threading
+import time as sleep_time
+from redbus_row_sink import RowSink
+from redbus_tracing import TRACER
+
+# Flush to Postgres whenever this many rows are buffered, or this many seconds have passed
+STREAM_FLUSH_ROWS = int(os.environ.get("REDBUS_STREAM_FLUSH_ROWS", 500))
+STREAM_FLUSH_SECONDS = float(os.environ.get("REDBUS_STREAM_FLUSH_SECONDS", 10))
+# Route batches allowed to wait in the queue before producers block (back-pressure)
+STREAM_QUEUE_BATCHES = int(os.environ.get("REDBUS_STREAM_QUEUE_BATCHES", 32))
+
+_STOP = object()
+
+def write_frame(engine, table, frame):
+    """Default flush: append a DataFrame with pandas.to_sql."""
+    frame.to_sql(table, engine, if_exists="append", index=False)
+
+class StreamingWriter:
+    """Consumer side of the scrape-to-database pipeline.
+
+    Scrapers put() each route's parsed rows; a single writer thread buffers them in a RowSink and
+    appends them to the table every flush_rows rows or flush_seconds seconds. The queue is bounded,
+    so a slow database makes put() block and the scrapers wait instead of piling rows up in memory.
+    """
+
+    def __init__(self, engine, columns, table="bus_details_backup", flush_rows=STREAM_FLUSH_ROWS,
+                 flush_seconds=STREAM_FLUSH_SECONDS, max_queued_batches=STREAM_QUEUE_BATCHES, write=write_frame,
+                 route_filter=None):
+        self.engine = engine
+        self.table = table
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.write = write
+        # Optional route_name -> bool; routes it rejects are dropped (incremental mode skips unchanged routes)
+        self.route_filter = route_filter
+        self.routes_skipped = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        # Routes with rows in a failed flush; the caller re-queues them in the crawl state
+        self.failed_routes = set()
+        self.flushes = 0
+        self._sink = RowSink(columns)
+        self._queue = queue.Queue(maxsize=max_queued_batches)
+        self._thread = threading.Thread(target=self._run, name="bus-details-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, rows):
+        """Queue one route's row dicts; blocks while the queue is full."""
+        if not rows:
+            return
+        if self.route_filter is not None and not self.route_filter(rows[0]['route_name']):
+            self.routes_skipped += 1
+            return
+        self._queue.put(rows)
+
+    def close(self):
+        """Flush whatever is left and wait for the writer thread to finish."""
+        self._queue.put(_STOP)
+        self._thread.join()
+        print(f"Streaming writer: {self.rows_written} rows written to {self.table} in {self.flushes} flushes"
+              + (f", {self.routes_skipped} unchanged routes skipped" if self.routes_skipped else "")
+              + (f", {self.rows_failed} rows failed" if self.rows_failed else ""))
+        return self.rows_failed == 0
+
+    def _flush(self):
+        if not len(self._sink):
+            return
+        frame = self._sink.drain()
+        try:
+            with TRACER.span("db_write", table=self.table, rows=len(frame)):
+                self.write(self.engine, self.table, frame)
+            self.rows_written += len(frame)
+            self.flushes += 1
+        except Exception as e:
+            self.rows_failed += len(frame)
+            self.failed_routes.update(frame['route_name'].dropna().unique())
+            print(f"Error writing {len(frame)} rows to {self.table}: {e}")
+
+    def _run(self):
+        last_flush = sleep_time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_seconds - (sleep_time.monotonic() - last_flush))
+            try:
+                batch = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                batch = None
+
+            if batch is _STOP:
+                self._flush()
+                return
+            if batch is not None:
+                self._sink.extend(batch)
+
+            if len(self._sink) >= self.flush_rows or sleep_time.monotonic() - last_flush >= self.flush_seconds:
+                self._flush()
+                last_flush = sleep_time.monotonic()
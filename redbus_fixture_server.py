@@ -0,0 +1,145 @@
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+from urllib.parse import urlparse, parse_qs
+import argparse
+import os
+import random
+import threading
+import time as sleep_time
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+ASSET_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".woff2": "font/woff2",
+    ".mp4": "video/mp4",
+    ".js": "application/javascript",
+}
+
+BUS_TYPES = ["A/C Sleeper (2+1)", "Non A/C Seater (2+2)", "Volvo Multi-Axle A/C Semi Sleeper (2+2)", "Non A/C Sleeper (2+1)"]
+
+ROUTE_CARD = """    <div class="clearfix row-one">
+      <div class="travels lh-24 f-bold d-color">Replay Travels {index}</div>
+      <div class="bus-type f-12 m-top-16 l-color">{bus_type}</div>
+      <div class="dp-time f-19 d-color f-bold">{departure}</div>
+      <div class="dur l-color lh-24">{hours:02d}h {minutes:02d}m</div>
+      <div class="bp-time f-19 d-color disp-Inline">{arrival}</div>{next_day}{rating}
+      <div class="fare d-block">INR <span class="f-19 f-bold">{price}</span></div>
+      <div class="seat-left m-top-30">{seats} Seats left</div>{window}
+    </div>
+"""
+
+def generated_route_page(buses, seed=0, view_buses=False):
+    """A server-rendered route page with buses row-one cards, deterministic for a given seed.
+
+    view_buses adds the "View Buses" button scrape_route waits for, like a real route page in a browser.
+    Without it the page is one the HTTP path accepts as complete (route_page_complete).
+    """
+    rng = random.Random(seed)
+    cards = []
+    for index in range(buses):
+        departure_minutes = rng.randrange(0, 24 * 60, 15)
+        hours, minutes = rng.randint(1, 14), rng.choice([0, 15, 30, 45])
+        arrival_minutes = departure_minutes + hours * 60 + minutes
+        seats = rng.randint(0, 45)
+        cards.append(ROUTE_CARD.format(
+            index=index,
+            bus_type=BUS_TYPES[index % len(BUS_TYPES)],
+            departure=f"{departure_minutes // 60:02d}:{departure_minutes % 60:02d}",
+            hours=hours,
+            minutes=minutes,
+            arrival=f"{arrival_minutes // 60 % 24:02d}:{arrival_minutes % 60:02d}",
+            next_day='\n      <div class="next-day-dp-lbl m-top-16">19-Oct</div>' if arrival_minutes >= 24 * 60 else "",
+            rating=('\n      <div class="rate_count">New</div>' if index % 11 == 0
+                    else f'\n      <div class="lh-18 rating rat-green"><span>{rng.uniform(1, 5):.1f}</span></div>'),
+            price=rng.randint(250, 3500),
+            seats=seats,
+            window=f'\n      <div class="window-left m-top-8">{seats // 3} Window</div>' if index % 4 else "",
+        ))
+    return ("<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><title>Generated route</title></head>\n<body>\n"
+            + ('  <div class="button">View Buses</div>\n' if view_buses else "")
+            + f'  <div class="result-sec">\n    <span class="f-bold busFound">{buses} Buses</span>\n'
+            + "".join(cards) + "  </div>\n</body>\n</html>\n")
+
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    """Serves recorded pages from the fixtures directory, with an optional artificial delay.
+
+    Paths under /assets/ are synthesised instead of read from disk: /assets/banner.png?bytes=50000
+    returns 50000 filler bytes with an image content type, so fixture pages can carry realistic
+    image/font/media weight without binary files in the repo. Likewise /generated/route.html?buses=2000&seed=3
+    returns a route page with 2000 bus cards (add &view_buses=1 for the browser's "View Buses" button).
+
+    latency is seconds per response, or a zero-argument callable for latency that changes during a run;
+    error_rate is the share of requests answered with 429 Too Many Requests.
+    """
+
+    latency = 0.0
+    error_rate = 0.0
+
+    def do_GET(self):
+        delay = self.latency() if callable(self.latency) else self.latency
+        if delay:
+            sleep_time.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            self.send_error(429, "Too Many Requests")
+            return
+        parsed = urlparse(self.path)
+        if parsed.path.startswith("/assets/"):
+            self.send_asset(parsed)
+            return
+        if parsed.path == "/generated/route.html":
+            self.send_generated_route(parsed)
+            return
+        super().do_GET()
+
+    def send_asset(self, parsed):
+        size = int(parse_qs(parsed.query).get("bytes", ["10000"])[0])
+        extension = os.path.splitext(parsed.path)[1]
+        self.send_response(200)
+        self.send_header("Content-Type", ASSET_TYPES.get(extension, "application/octet-stream"))
+        self.send_header("Content-Length", str(size))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(b"\0" * size)
+
+    def send_generated_route(self, parsed):
+        query = parse_qs(parsed.query)
+        body = generated_route_page(int(query.get("buses", ["500"])[0]), int(query.get("seed", ["0"])[0]),
+                                    view_buses=query.get("view_buses", ["0"])[0] == "1").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fixture_server(root=FIXTURES_DIR, latency=0.0, port=0, error_rate=0.0):
+    """Start a background HTTP server over root and return (server, base_url); call server.shutdown() when done."""
+    handler_class = type("LatencyFixtureHandler", (FixtureRequestHandler,), {
+        "latency": staticmethod(latency) if callable(latency) else latency,
+        "error_rate": error_rate,
+    })
+    handler = partial(handler_class, directory=root)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded RedBus pages locally")
+    parser.add_argument("--root", default=FIXTURES_DIR)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to delay every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429")
+    args = parser.parse_args()
+
+    server, base_url = start_fixture_server(args.root, args.latency, args.port, args.error_rate)
+    print(f"Serving {args.root} at {base_url} (latency {args.latency}s), Ctrl+C to stop")
+    try:
+        while True:
+            sleep_time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,11 +1,19 @@
 import streamlit as st
 import psycopg2
+import pandas as pd
+import os
 from datetime import time
 from decimal import Decimal
+from redbus_db_pool import ConnectionPool
+from redbus_result_cache import VersionedResultCache
+from redbus_search import SEARCH_PAGE_SIZE, count_buses, fetch_bus_page, normalize_search_filters, page_key
+from redbus_search_index import SEARCH_ENGINE, ColumnarSearchIndex, SearchIndexHolder
 
 
 def connect_db():
-    # Replace these with your actual database credentials
+    # Replace these with your actual database credentials, or set REDBUS_DATABASE_URL
+    if os.environ.get("REDBUS_DATABASE_URL"):
+        return psycopg2.connect(os.environ["REDBUS_DATABASE_URL"])
     return psycopg2.connect(
         dbname="redbus_db",
         user="postgres",
@@ -13,6 +21,35 @@ def connect_db():
         host="localhost"
     )
 
+@st.cache_resource
+def get_pool():
+    """One connection pool per server process, shared by every session (sizes: REDBUS_DB_POOL_MIN/MAX)"""
+    return ConnectionPool(connect_db)
+
+def read_data_version():
+    """bus_routes' data-version marker, bumped by the cleaning job after every load"""
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT to_regclass('data_versions') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            return None
+        cur.execute("SELECT version FROM data_versions WHERE table_name = 'bus_routes'")
+        row = cur.fetchone()
+        return row[0] if row else None
+
+@st.cache_resource
+def get_result_cache():
+    """Metadata and search results shared by every session, emptied when the data version changes"""
+    return VersionedResultCache(read_data_version)
+
+@st.cache_resource
+def get_search_index():
+    """bus_routes snapshot searched in memory when REDBUS_SEARCH_ENGINE=memory, reloaded on a new data version"""
+    def load():
+        with get_pool().connection() as conn:
+            return ColumnarSearchIndex.load(conn)
+    return SearchIndexHolder(load, read_data_version)
+
 def clean_route_name(route_name, agency):
     """Remove agency name and clean up route display"""
     if route_name.startswith(agency):
@@ -26,48 +63,55 @@ def clean_route_name(route_name, agency):
 def get_travel_agencies():
     """Get unique travel agencies from the database"""
     try:
-        conn = connect_db()
+        return get_result_cache().get(("agencies",), fetch_travel_agencies)
+    except Exception as e:
+        return []
+
+def fetch_travel_agencies():
+    with get_pool().connection() as conn:
         cur = conn.cursor()
-        
+    
         query = """
-        SELECT DISTINCT 
-            split_part(route_name, '_', 1) as agency
-        FROM bus_routes
-        ORDER BY agency
+        SELECT agency_name
+        FROM agencies
+        ORDER BY agency_name
         """
-        
+    
         cur.execute(query)
-        agencies = [row[0].strip() for row in cur.fetchall()]
+        agencies = [row[0] for row in cur.fetchall()]
         return agencies
-    except Exception as e:
-        return []
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 def get_routes_for_agency(agency):
     """Get all routes for a specific travel agency"""
     try:
-        conn = connect_db()
+        return get_result_cache().get(("routes", agency), lambda: fetch_routes_for_agency(agency))
+    except Exception as e:
+        return {}
+
+def fetch_routes_for_agency(agency):
+    with get_pool().connection() as conn:
         cur = conn.cursor()
-        
+    
         query = """
-        SELECT DISTINCT route_name
-        FROM bus_routes
-        WHERE route_name LIKE %s
-        ORDER BY route_name
+        SELECT r.route_name, r.route_id
+        FROM routes r
+        JOIN agencies a ON a.agency_id = r.agency_id
+        WHERE a.agency_name = %s
+        ORDER BY r.route_name
         """
-        
-        cur.execute(query, [f"{agency}%"])
+    
+        cur.execute(query, [agency])
         routes = cur.fetchall()
-        
-        route_mapping = {clean_route_name(route[0], agency): route[0] for route in routes}
+    
+        # Displayed route label -> route_id
+        route_mapping = {clean_route_name(route[0], agency): route[1] for route in routes}
         return route_mapping
-    except Exception as e:
-        return {}
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def format_duration(duration_minutes):
+    """Show duration_minutes the way the scraped text did, e.g. 450 -> '7h 30m'"""
+    if duration_minutes is None:
+        return "-"
+    return f"{duration_minutes // 60}h {duration_minutes % 60}m"
 
 def create_time_ranges():
     """Create a list of 30-minute time range choices, including 'Any Time'"""
@@ -85,127 +129,156 @@ def create_time_ranges():
 def get_max_seats():
     """Get the maximum number of seats available across all buses"""
     try:
-        conn = connect_db()
+        return get_result_cache().get(("max_seats",), fetch_max_seats)
+    except Exception as e:
+        return 50
+
+def fetch_max_seats():
+    with get_pool().connection() as conn:
         cur = conn.cursor()
         query = "SELECT MAX(total_seats) FROM bus_routes"
         cur.execute(query)
         max_seats = cur.fetchone()[0]
         return max_seats or 50
-    except Exception as e:
-        return 50
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 def get_max_price():
     """Get the maximum price across all buses"""
     try:
-        conn = connect_db()
+        return get_result_cache().get(("max_price",), fetch_max_price)
+    except Exception as e:
+        return 2000
+
+def fetch_max_price():
+    with get_pool().connection() as conn:
         cur = conn.cursor()
         query = "SELECT MAX(price_inr) FROM bus_routes"
         cur.execute(query)
         max_price = cur.fetchone()[0]
         # Convert Decimal to int to avoid type mismatches
         return int(max_price) if max_price else 2000
-    except Exception as e:
-        return 2000
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def fetch_buses(filters, after, page_size):
+    """One page of bus_routes rows matching normalised filters, plus one row if there is a next page"""
+    if SEARCH_ENGINE == "memory":
+        return get_search_index().current().fetch_bus_page(filters, after=after, page_size=page_size)
+    with get_pool().connection() as conn:
+        return fetch_bus_page(conn, filters, after=after, page_size=page_size)
+
+def fetch_bus_count(filters):
+    if SEARCH_ENGINE == "memory":
+        return get_search_index().current().count_buses(filters)
+    with get_pool().connection() as conn:
+        return count_buses(conn, filters)
 
 def search_buses(agency, cleaned_route, departure_range, reaching_range, 
                 min_seats, min_window_seats, min_price, max_price, min_rating):
+    """Start a new search: remember its filters and go back to the first page"""
     try:
-        conn = connect_db()
-        cur = conn.cursor()
-        
         route_mapping = get_routes_for_agency(agency)
         cleaned_route_str = str(cleaned_route) if cleaned_route is not None else None
-        original_route = route_mapping.get(cleaned_route_str)
+        route_id = route_mapping.get(cleaned_route_str)
         
-        query = """
-        SELECT 
-            route_name,
-            bus_name,
-            bus_type,
-            departing_time,
-            duration,
-            reaching_time,
-            star_rating_out_of_5,
-            price_inr,
-            total_seats,
-            window_seats,
-            route_link  -- Added route_link to the query
-        FROM bus_routes
-        WHERE 1=1
-        """
-        
-        params = []
+        # Same filters, same cache entry: "Any Time" and the numeric inputs are normalised first
+        filters = normalize_search_filters(route_id, departure_range, reaching_range,
+                                           min_seats, min_window_seats, min_price, max_price, min_rating)
+        # Keyset cursors of the pages visited so far; None starts the first page
+        st.session_state.search = {"agency": agency, "filters": filters, "cursors": [None]}
+    except Exception as e:
+        st.error(f"Error: {str(e)}")
+
+def next_page(key):
+    st.session_state.search["cursors"].append(key)
+
+def previous_page():
+    st.session_state.search["cursors"].pop()
+
+def show_results_table(rows, agency):
+    """All rows of the page in one scrollable st.dataframe, which only draws the visible cells"""
+    table = pd.DataFrame({
+        "Route": [clean_route_name(row[0], agency) for row in rows],
+        "Bus": [row[1] for row in rows],
+        "Bus Type": [row[2] for row in rows],
+        "Departure": [row[3] for row in rows],
+        "Duration": [format_duration(row[4]) for row in rows],
+        "Arrival": [row[5] for row in rows],
+        "Rating": [float(row[6]) if row[6] is not None else None for row in rows],
+        "Price (₹)": [float(row[7]) if row[7] is not None else None for row in rows],
+        "Total Seats": [row[8] for row in rows],
+        "Window Seats": [row[9] for row in rows],
+        "Link": [row[10] for row in rows],
+    })
+    st.dataframe(table, hide_index=True, use_container_width=True,
+                 column_config={"Link": st.column_config.LinkColumn("Link", display_text="Book")})
+
+def show_results_cards(rows, agency):
+    # Display results with clickable titles
+    for row in rows:
+        clean_route = clean_route_name(row[0], agency)
+        route_link = row[10]  # Get the route_link from the query results
+    
+        # Create a clickable title using markdown
+        title = f"{clean_route} - {row[1]}"
+        if route_link:
+            st.markdown(f"<h3><a href='{route_link}' target='_blank'>{title}</a></h3>", unsafe_allow_html=True)
+        else:
+            st.markdown(f"<h3>{title}</h3>", unsafe_allow_html=True)
         
-        if original_route:
-            query += " AND route_name = %s"
-            params.append(original_route)
-            
-        if departure_range and departure_range != "Any Time":
-            start_time, end_time = departure_range.split(" - ")
-            query += " AND departing_time::time BETWEEN %s::time AND %s::time"
-            params.extend([start_time, end_time])
-            
-        if reaching_range and reaching_range != "Any Time":
-            start_time, end_time = reaching_range.split(" - ")
-            query += " AND reaching_time::time BETWEEN %s::time AND %s::time"
-            params.extend([start_time, end_time])
-            
-        query += " AND total_seats >= %s"
-        params.append(min_seats)
+        # Display the rest of the information in an expander
+        with st.expander("View Details", expanded=True):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write(f"**Bus Type:** {row[2]}")
+                st.write(f"**Departure:** {row[3]}")
+                st.write(f"**Duration:** {format_duration(row[4])}")
+                st.write(f"**Arrival:** {row[5]}")
+            with col2:
+                st.write(f"**Rating:** {row[6]}/5")
+                st.write(f"**Price:** ₹{row[7]}")
+                st.write(f"**Total Seats:** {row[8]}")
+                st.write(f"**Window Seats:** {row[9]}")
+
+def show_search_results():
+    """The current page of the last search, with its match count and Previous/Next buttons"""
+    search = st.session_state.search
+    try:
+        view_col, size_col = st.columns(2)
+        with view_col:
+            view = st.radio("View", ["Table", "Cards"], horizontal=True)
+        with size_col:
+            page_sizes = sorted({25, 50, 100, 200, SEARCH_PAGE_SIZE})
+            page_size = st.selectbox("Results per page", options=page_sizes, index=page_sizes.index(SEARCH_PAGE_SIZE))
+        if search.get("page_size") != page_size:
+            search["page_size"] = page_size
+            search["cursors"] = [None]
         
-        query += " AND window_seats >= %s"
-        params.append(min_window_seats)
-            
-        query += " AND price_inr BETWEEN %s AND %s"
-        params.extend([min_price, max_price])
-            
-        query += " AND star_rating_out_of_5 >= %s"
-        params.append(min_rating)
-            
-        cur.execute(query, params)
-        results = cur.fetchall()
+        filters, after = search["filters"], search["cursors"][-1]
+        cache = get_result_cache()
+        rows = cache.get(("search",) + filters + (after, page_size), lambda: fetch_buses(filters, after, page_size))
+        count, exact = cache.get(("search_count",) + filters, lambda: fetch_bus_count(filters))
         
-        if not results:
+        if not rows:
             st.warning("No buses found matching your criteria.")
             return
         
-        # Display results with clickable titles
-        for row in results:
-            clean_route = clean_route_name(row[0], agency)
-            route_link = row[10]  # Get the route_link from the query results
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        first = (len(search["cursors"]) - 1) * page_size + 1
+        total = f"{count:,}" if exact else f"about {count:,}"
+        st.caption(f"Showing {first:,}-{first + len(rows) - 1:,} of {total} buses, cheapest first")
+        
+        if view == "Table":
+            show_results_table(rows, search["agency"])
+        else:
+            show_results_cards(rows, search["agency"])
+        
+        prev_col, next_col = st.columns(2)
+        with prev_col:
+            st.button("Previous", on_click=previous_page, disabled=len(search["cursors"]) == 1)
+        with next_col:
+            st.button("Next", on_click=next_page, args=(page_key(rows[-1]),), disabled=not has_next)
             
-            # Create a clickable title using markdown
-            title = f"{clean_route} - {row[1]}"
-            if route_link:
-                st.markdown(f"<h3><a href='{route_link}' target='_blank'>{title}</a></h3>", unsafe_allow_html=True)
-            else:
-                st.markdown(f"<h3>{title}</h3>", unsafe_allow_html=True)
-                
-            # Display the rest of the information in an expander
-            with st.expander("View Details", expanded=True):
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.write(f"**Bus Type:** {row[2]}")
-                    st.write(f"**Departure:** {row[3]}")
-                    st.write(f"**Duration:** {row[4]}")
-                    st.write(f"**Arrival:** {row[5]}")
-                with col2:
-                    st.write(f"**Rating:** {row[6]}/5")
-                    st.write(f"**Price:** ₹{row[7]}")
-                    st.write(f"**Total Seats:** {row[8]}")
-                    st.write(f"**Window Seats:** {row[9]}")
-                
     except Exception as e:
         st.error(f"Error: {str(e)}")
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 def main():
     st.set_page_config(page_title="Bus Route Search", page_icon="🚌", layout="wide")
@@ -277,11 +350,24 @@ def main():
                              step=0.5)
         
         if st.button("Search Buses", type="primary"):
+            search_buses(agency, route, departure_range, reaching_range,
+                         min_seats, min_window_seats, min_price, max_price_input,
+                         min_rating)
+        
+        # Results stay up while paging; Previous/Next rerun the script without pressing Search again
+        if "search" in st.session_state:
             with col2:
                 st.subheader("Search Results")
-                search_buses(agency, route, departure_range, reaching_range,
-                           min_seats, min_window_seats, min_price, max_price_input,
-                           min_rating)
+                show_search_results()
+        
+        # Process-wide counts: every session's renders and searches share the cache
+        cache_stats = get_result_cache().stats()
+        st.caption(f"Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                   f"{cache_stats['entries']} entries, data version {cache_stats['version']}")
+        if SEARCH_ENGINE == "memory":
+            index_stats = get_search_index().stats()
+            st.caption(f"In-memory search: {index_stats['rows']} rows, data version {index_stats['version']}, "
+                       f"loaded in {index_stats['load_seconds']:.1f}s")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,100 @@
+from lxml import html
+from lxml.cssselect import CSSSelector
+from lxml.etree import XPath
+import sys
+
+# Compiled once at import, reused for every card on every route
+BUS_CARD = XPath("//div[contains(@class, 'clearfix') and contains(@class, 'row-one')]")
+BUS_NAME = CSSSelector(".travels")
+BUS_TYPE = CSSSelector(".bus-type.f-12")
+DEPARTURE_TIME = CSSSelector(".dp-time.f-19")
+DURATION = CSSSelector(".dur.l-color")
+ARRIVAL_TIME = CSSSelector(".bp-time.f-19")
+NEXT_DAY = CSSSelector(".next-day-dp-lbl")
+RATING = CSSSelector(".lh-18.rating span")
+RATE_COUNT = CSSSelector(".rate_count")
+PRICE = CSSSelector(".fare .f-19")
+SEATS_LEFT = CSSSelector(".seat-left")
+WINDOW_LEFT = CSSSelector(".window-left")
+
+def element_text(card, selector):
+    """Whitespace-normalised text of the first match, or None when the selector finds nothing."""
+    matches = selector(card)
+    if not matches:
+        return None
+    return " ".join(matches[0].text_content().split())
+
+def required_text(card, selector):
+    """Same as element_text, but a missing element drops the whole card like a failed find_element did."""
+    value = element_text(card, selector)
+    if value is None:
+        raise LookupError(f"no element matches '{selector.css}'")
+    return value
+
+def first_word(text, default):
+    """First token of a '12 Seats left' style label, falling back to default when empty or missing."""
+    if text:
+        return text.split()[0]
+    return default
+
+def parse_bus_card(card, route_name, route_link):
+    """Turn one row-one card into the 10-column bus_details row."""
+    bus_name = required_text(card, BUS_NAME)
+    bus_type = required_text(card, BUS_TYPE)
+    departure_time = required_text(card, DEPARTURE_TIME)
+    duration = required_text(card, DURATION)
+
+    # Arrival time + date
+    arrival_time = required_text(card, ARRIVAL_TIME)
+    next_day = element_text(card, NEXT_DAY)
+    arrival_datetime = f"{arrival_time} ({next_day})" if next_day is not None else arrival_time
+
+    # Rating - handles both numeric and "New"
+    rating = element_text(card, RATING)
+    if rating is None:
+        rating = element_text(card, RATE_COUNT)
+    if rating is None:
+        rating = "N/A"
+
+    price = required_text(card, PRICE)
+
+    # Available seats and window seats
+    seats = first_word(element_text(card, SEATS_LEFT), "0")
+    window_seats = first_word(element_text(card, WINDOW_LEFT), None)
+    if window_seats is not None:
+        seats_info = f"{seats} Seats | {window_seats} Window"
+    else:
+        seats_info = f"{seats} Seats"
+
+    return {
+        'route_name': route_name,
+        'route_link': route_link,
+        'bus_name': bus_name,
+        'bus_type': bus_type,
+        'departing_time': departure_time,
+        'duration': duration,
+        'reaching_time': arrival_datetime,
+        'star_rating': rating,
+        'price': price,
+        'seats_available': seats_info
+    }
+
+def parse_bus_cards(page_source, route_name, route_link):
+    """Parse every bus card out of a single page_source snapshot, no browser required."""
+    tree = html.fromstring(page_source)
+    rows = []
+    for card in BUS_CARD(tree):
+        try:
+            rows.append(parse_bus_card(card, route_name, route_link))
+        except Exception as e:
+            print(f"Error parsing bus details: {e}")
+            continue
+    return rows
+
+if __name__ == "__main__":
+    # Parse a saved route page: python redbus_html_parser.py saved_route.html
+    with open(sys.argv[1], encoding="utf-8") as saved_page:
+        saved_rows = parse_bus_cards(saved_page.read(), route_name=sys.argv[1], route_link="")
+    for row in saved_rows:
+        print(row)
+    print(f"Found {len(saved_rows)} buses")
@@ -0,0 +1,187 @@
+from lxml import html
+from lxml.cssselect import CSSSelector
+from urllib.parse import urljoin
+import aiohttp
+import argparse
+import asyncio
+import os
+import re
+from redbus_html_parser import BUS_CARD, parse_bus_cards
+from redbus_rate_limiter import SCHEDULER
+from redbus_tracing import TRACER
+from redbus_crawl_state import mark_agency_done, mark_route_started, mark_route_done
+
+# Size of the shared aiohttp connection pool
+HTTP_CONCURRENCY = int(os.environ.get("REDBUS_HTTP_CONCURRENCY", 16))
+HTTP_TIMEOUT = 20
+# Route pages fetched per round, so only this many pages of HTML are held at once
+HTTP_BATCH_PAGES = 200
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0",
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "en-IN,en;q=0.9",
+}
+
+ROUTE_LINK = CSSSelector("a.route")
+PAGE_TABS = CSSSelector("div.DC_117_paginationTable div.DC_117_pageTabs")
+BUS_FOUND = CSSSelector(".busFound")
+VIEW_BUSES = CSSSelector(".button")
+
+# How many pages each path served during this process, for the end-of-run share report
+fetch_path_counts = {"http": 0, "browser": 0}
+
+async def _fetch_one(session, semaphore, url):
+    async with semaphore:
+        try:
+            # The shared scheduler paces requests per host and adapts to latency, timeouts and 429/503s
+            async with SCHEDULER.request(url) as slot:
+                with TRACER.span("http_fetch", url=url):
+                    async with session.get(url) as response:
+                        if response.status in (429, 503):
+                            slot.error_page()
+                        if response.status != 200:
+                            TRACER.count("http_status_" + str(response.status), url=url)
+                            print(f"HTTP {response.status} for {url}, leaving it to the browser")
+                            return url, None
+                        return url, await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"HTTP fetch failed for {url}: {e!r}, leaving it to the browser")
+            return url, None
+
+async def _fetch_all(urls, concurrency):
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HTTP_HEADERS) as session:
+        return dict(await asyncio.gather(*(_fetch_one(session, semaphore, url) for url in urls)))
+
+def fetch_pages(urls, concurrency=HTTP_CONCURRENCY):
+    """Fetch every url concurrently over one pooled session; failed fetches map to None."""
+    urls = list(urls)
+    if not urls:
+        return {}
+    return asyncio.run(_fetch_all(urls, concurrency))
+
+def parse_agency_routes(page_source, page_url, name_string):
+    """Route links of a server-rendered agency page, or None when the page needs JavaScript pagination."""
+    tree = html.fromstring(page_source)
+    route_anchors = ROUTE_LINK(tree)
+    if not route_anchors or len(PAGE_TABS(tree)) > 1:
+        return None
+    return {
+        name_string + '_' + " ".join(anchor.text_content().split()): urljoin(page_url, anchor.get("href"))
+        for anchor in route_anchors
+    }
+
+def route_page_complete(page_source):
+    """True when the bus list is fully present in the HTML: cards rendered, nothing behind a 'View Buses' click,
+    and the advertised bus count (when shown) matches the cards found."""
+    tree = html.fromstring(page_source)
+    cards = BUS_CARD(tree)
+    if not cards:
+        return False
+    if any(" ".join(button.text_content().split()).upper() == "VIEW BUSES" for button in VIEW_BUSES(tree)):
+        return False
+    for counter in BUS_FOUND(tree):
+        advertised = re.search(r"\d+", counter.text_content())
+        if advertised and int(advertised.group()) != len(cards):
+            return False
+    return True
+
+def extract_travel_links_http(links_dict, agencies_dict, max_successful_agencies=10, crawl_state=None):
+    """HTTP-first version of extract_travel_links.
+
+    Returns (links_dict, agencies that need the browser, number of agencies served over HTTP).
+    """
+    pages = fetch_pages(agencies_dict.values())
+    needs_browser = {}
+    successful_travel_agencies = 0
+    for name_string, link in agencies_dict.items():
+        if successful_travel_agencies >= max_successful_agencies:
+            break
+        with TRACER.span("http_parse", agency=name_string):
+            agency_links = parse_agency_routes(pages[link], link, name_string) if pages.get(link) else None
+        if agency_links is None:
+            needs_browser[name_string] = link
+            continue
+        links_dict.update(agency_links)
+        if crawl_state is not None:
+            mark_agency_done(crawl_state, name_string, agency_links)
+        successful_travel_agencies += 1
+        fetch_path_counts["http"] += 1
+        print(f"Success over HTTP: Processed travel agency '{name_string}' ({len(agency_links)} routes)")
+    return links_dict, needs_browser, successful_travel_agencies
+
+def scrape_bus_details_http(links_dict, crawl_state=None, writer=None, archive=None):
+    """HTTP-first version of scrape_bus_details.
+
+    Returns (rows of every route served over HTTP, routes that need the browser). When a streaming
+    writer is given, rows are handed to it route by route; with a crawl_state they are only checkpointed
+    there. In both cases the returned list stays empty. Pages parsed here are kept in archive (a
+    PageArchive) when one is given.
+    """
+    rows = []
+    needs_browser = {}
+    routes = list(links_dict.items())
+    for start in range(0, len(routes), HTTP_BATCH_PAGES):
+        batch = routes[start:start + HTTP_BATCH_PAGES]
+        pages = fetch_pages(route_link for _, route_link in batch)
+        for route_name, route_link in batch:
+            page_source = pages.get(route_link)
+            with TRACER.span("http_parse", route=route_name):
+                complete = bool(page_source) and route_page_complete(page_source)
+                route_rows = parse_bus_cards(page_source, route_name, route_link) if complete else []
+            if not complete:
+                needs_browser[route_name] = route_link
+                continue
+            if archive is not None:
+                with TRACER.span("archive", route=route_name):
+                    archive.store(route_name, route_link, page_source, source="http")
+            labelled_rows = {route_name: route_rows}
+            if crawl_state is not None:
+                with TRACER.span("checkpoint", route=route_name):
+                    mark_route_started(crawl_state, route_name)
+                    labelled_rows = mark_route_done(crawl_state, route_name, route_rows)
+            for label_rows in labelled_rows.values():
+                if writer is not None:
+                    writer.put(label_rows)
+                elif crawl_state is None:
+                    rows.extend(label_rows)
+            fetch_path_counts["http"] += 1
+            print(f"Found {len(route_rows)} buses over HTTP for route {route_name}")
+    return rows, needs_browser
+
+def record_browser_pages(count):
+    fetch_path_counts["browser"] += count
+
+def print_fetch_path_report():
+    total = fetch_path_counts["http"] + fetch_path_counts["browser"]
+    if not total:
+        print("No pages fetched")
+        return
+    print(f"Pages served over HTTP: {fetch_path_counts['http']}/{total} ({fetch_path_counts['http'] / total:.0%}), "
+          f"by the browser: {fetch_path_counts['browser']}/{total} ({fetch_path_counts['browser'] / total:.0%})")
+
+if __name__ == "__main__":
+    from redbus_fixture_server import start_fixture_server
+
+    parser = argparse.ArgumentParser(description="Try the HTTP-first fetch path against recorded pages on a local server")
+    parser.add_argument("--agency-pages", nargs="+", default=["agency_single_page.html", "agency_paginated.html"])
+    parser.add_argument("--route-pages", nargs="+", default=["route_server_rendered.html", "route_with_assets.html"])
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, base_url = start_fixture_server(latency=args.latency)
+    try:
+        links, agencies_for_browser, _ = extract_travel_links_http(
+            {}, {page: f"{base_url}/{page}" for page in args.agency_pages}, max_successful_agencies=len(args.agency_pages)
+        )
+        http_rows, routes_for_browser = scrape_bus_details_http({page: f"{base_url}/{page}" for page in args.route_pages})
+        record_browser_pages(len(agencies_for_browser) + len(routes_for_browser))
+        print(f"Agencies needing the browser: {list(agencies_for_browser)}")
+        print(f"Routes needing the browser: {list(routes_for_browser)}")
+        print(f"{len(links)} route links and {len(http_rows)} bus rows parsed without a browser")
+        print_fetch_path_report()
+        TRACER.print_summary()
+    finally:
+        server.shutdown()
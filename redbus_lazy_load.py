@@ -0,0 +1,66 @@
+import os
+import time as sleep_time
+
+# Cheap "has more content arrived?" probes, each a single execute_script round-trip
+LOAD_SIGNALS = {
+    "card_count": "return document.querySelectorAll('div.clearfix.row-one').length;",
+    "scroll_height": "return document.body.scrollHeight;",
+    "cards_and_height": "return [document.querySelectorAll('div.clearfix.row-one').length, document.body.scrollHeight];",
+}
+
+LOAD_SIGNAL = os.environ.get("REDBUS_LOAD_SIGNAL", "cards_and_height")
+# Consecutive key presses without a signal change before a scroll pass counts as converged
+STABLE_ITERATIONS = int(os.environ.get("REDBUS_STABLE_ITERATIONS", 2))
+# Hard cap on a single scroll pass, whatever the page keeps doing
+MAX_SCROLL_SECONDS = 120
+MAX_SCROLL_ITERATIONS = 2000
+POLL_INTERVAL = 0.05
+
+def read_load_signal(driver, signal=None):
+    """Evaluate the configured load signal in the page."""
+    return driver.execute_script(LOAD_SIGNALS[signal or LOAD_SIGNAL])
+
+def wait_for_signal_change(driver, previous, settle_timeout, signal=None):
+    """Poll the load signal for up to settle_timeout seconds and return the latest value."""
+    deadline = sleep_time.monotonic() + settle_timeout
+    current = read_load_signal(driver, signal)
+    while current == previous and sleep_time.monotonic() < deadline:
+        sleep_time.sleep(POLL_INTERVAL)
+        current = read_load_signal(driver, signal)
+    return current
+
+def scroll_until_stable(driver, body, key, settle_timeout, signal=None, stable_iterations=None):
+    """Press key until the load signal stops changing for stable_iterations presses in a row.
+
+    Returns (iterations, seconds, converged); converged is False when a bound was hit first.
+    """
+    stable_iterations = stable_iterations or STABLE_ITERATIONS
+    started = sleep_time.monotonic()
+    current = read_load_signal(driver, signal)
+    iterations = 0
+    unchanged = 0
+
+    while unchanged < stable_iterations:
+        if iterations >= MAX_SCROLL_ITERATIONS or sleep_time.monotonic() - started > MAX_SCROLL_SECONDS:
+            return iterations, sleep_time.monotonic() - started, False
+        previous = current
+        body.send_keys(key)
+        iterations += 1
+        current = wait_for_signal_change(driver, previous, settle_timeout, signal)
+        unchanged = unchanged + 1 if current == previous else 0
+
+    return iterations, sleep_time.monotonic() - started, True
+
+def load_full_content(driver, body, scroll_passes, signal=None, stable_iterations=None):
+    """Run each (label, key, settle_timeout) scroll pass in turn and report how long convergence took."""
+    report = {"iterations": 0, "seconds": 0.0, "converged": True}
+    for label, key, settle_timeout in scroll_passes:
+        iterations, seconds, converged = scroll_until_stable(
+            driver, body, key, settle_timeout, signal=signal, stable_iterations=stable_iterations
+        )
+        status = "converged" if converged else "hit the scroll limit"
+        print(f"Scroll pass '{label}' {status} after {iterations} iterations in {seconds:.2f}s")
+        report["iterations"] += iterations
+        report["seconds"] += seconds
+        report["converged"] = report["converged"] and converged
+    return report
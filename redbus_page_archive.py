@@ -0,0 +1,176 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from multiprocessing import Pool
+import zstandard
+from redbus_html_parser import parse_bus_cards
+from redbus_route_index import build_route_index, canonical_route_url, fan_out_rows
+
+PAGE_ARCHIVE_DIR = os.environ.get("REDBUS_PAGE_ARCHIVE", "page_archive")
+ZSTD_LEVEL = int(os.environ.get("REDBUS_ARCHIVE_ZSTD_LEVEL", 10))
+REPARSE_PROCESSES = int(os.environ.get("REDBUS_REPARSE_PROCESSES", os.cpu_count() or 1))
+
+MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    route_name TEXT NOT NULL,
+    route_link TEXT NOT NULL,
+    crawled_at TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    raw_bytes INTEGER NOT NULL,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_link_time ON snapshots (route_link, crawled_at);
+CREATE INDEX IF NOT EXISTS snapshots_name_time ON snapshots (route_name, crawled_at);
+CREATE TABLE IF NOT EXISTS objects (
+    sha256 TEXT PRIMARY KEY,
+    raw_bytes INTEGER NOT NULL,
+    stored_bytes INTEGER NOT NULL
+);
+"""
+
+def object_path(archive_dir, sha256):
+    return os.path.join(archive_dir, "objects", sha256[:2], sha256 + ".html.zst")
+
+class PageArchive:
+    """Raw route pages, stored once per distinct content and indexed by route link and crawl time.
+
+    Each page is hashed (SHA-256 of the UTF-8 HTML) and written zstd-compressed to
+    objects/<aa>/<sha256>.html.zst; a page that did not change since the last crawl only adds a manifest
+    row. The manifest (manifest.sqlite3) records route_name, route_link, crawled_at and the object hash.
+    """
+
+    def __init__(self, archive_dir=PAGE_ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        os.makedirs(os.path.join(archive_dir, "objects"), exist_ok=True)
+        self._manifest = sqlite3.connect(os.path.join(archive_dir, "manifest.sqlite3"), check_same_thread=False)
+        self._manifest.executescript(MANIFEST_SCHEMA)
+        self._lock = threading.Lock()
+        # ZstdCompressor objects are not thread-safe, so every scraping thread gets its own
+        self._local = threading.local()
+
+    def _compressor(self):
+        if not hasattr(self._local, "compressor"):
+            self._local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return self._local.compressor
+
+    def store(self, route_name, route_link, page_source, source="browser", crawled_at=None):
+        """Archive one page snapshot; returns its content hash."""
+        raw = page_source.encode("utf-8")
+        sha256 = hashlib.sha256(raw).hexdigest()
+        path = object_path(self.archive_dir, sha256)
+        stored_bytes = None
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = self._compressor().compress(raw)
+            # Write under a temporary name so a crash never leaves a truncated object behind
+            temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary_path, "wb") as object_file:
+                object_file.write(compressed)
+            os.replace(temporary_path, path)
+            stored_bytes = len(compressed)
+        with self._lock, self._manifest:
+            if stored_bytes is not None:
+                self._manifest.execute(
+                    "INSERT OR IGNORE INTO objects (sha256, raw_bytes, stored_bytes) VALUES (?, ?, ?)",
+                    (sha256, len(raw), stored_bytes),
+                )
+            self._manifest.execute(
+                "INSERT INTO snapshots (route_name, route_link, crawled_at, sha256, raw_bytes, source) VALUES (?, ?, ?, ?, ?, ?)",
+                (route_name, route_link, crawled_at or datetime.now().isoformat(timespec="seconds"), sha256, len(raw), source),
+            )
+        return sha256
+
+    def latest_snapshots(self, crawled_before=None):
+        """(route_name, route_link, crawled_at, sha256) of the newest snapshot per route, optionally as of a time."""
+        query = """
+            SELECT route_name, route_link, MAX(crawled_at), sha256 FROM snapshots
+            {where} GROUP BY route_name ORDER BY MIN(snapshot_id)
+        """.format(where="WHERE crawled_at <= ?" if crawled_before else "")
+        with self._lock:
+            return self._manifest.execute(query, (crawled_before,) if crawled_before else ()).fetchall()
+
+    def footprint(self):
+        """Snapshot count, raw size, unique size and bytes on disk, with the dedup and compression ratios."""
+        with self._lock:
+            snapshots, snapshot_bytes = self._manifest.execute("SELECT COUNT(*), COALESCE(SUM(raw_bytes), 0) FROM snapshots").fetchone()
+            objects, unique_bytes, stored_bytes = self._manifest.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_bytes), 0), COALESCE(SUM(stored_bytes), 0) FROM objects"
+            ).fetchone()
+        return {
+            "snapshots": snapshots,
+            "objects": objects,
+            "snapshot_bytes": snapshot_bytes,
+            "unique_bytes": unique_bytes,
+            "stored_bytes": stored_bytes,
+            "dedup_ratio": snapshot_bytes / unique_bytes if unique_bytes else None,
+            "compression_ratio": unique_bytes / stored_bytes if stored_bytes else None,
+        }
+
+    def print_footprint(self):
+        numbers = self.footprint()
+        if not numbers["snapshots"]:
+            print(f"Page archive {self.archive_dir} is empty")
+            return numbers
+        print(f"Page archive {self.archive_dir}: {numbers['snapshots']} snapshots of {numbers['snapshot_bytes'] / 1e6:.1f} MB "
+              f"-> {numbers['objects']} unique pages ({numbers['dedup_ratio']:.1f}x dedup) "
+              f"-> {numbers['stored_bytes'] / 1e6:.1f} MB on disk ({numbers['compression_ratio']:.1f}x zstd, "
+              f"{numbers['snapshot_bytes'] / max(numbers['stored_bytes'], 1):.1f}x overall)")
+        return numbers
+
+    def close(self):
+        with self._lock:
+            self._manifest.close()
+
+def load_page_source(archive_dir, sha256):
+    with open(object_path(archive_dir, sha256), "rb") as object_file:
+        return zstandard.ZstdDecompressor().decompress(object_file.read()).decode("utf-8")
+
+def _reparse_snapshot(task):
+    """Pool worker: decompress one archived page and run it through the current parser."""
+    archive_dir, route_name, route_link, crawled_at, sha256 = task
+    return route_name, route_link, crawled_at, parse_bus_cards(load_page_source(archive_dir, sha256), route_name, route_link)
+
+def reparse_archive(archive, processes=REPARSE_PROCESSES, crawled_before=None, links_dict=None):
+    """Rebuild scraped rows from the newest archived snapshot of every route, across processes.
+
+    Each row gets departing_date from its snapshot's crawl time, so reloading old pages does not
+    relabel them as today's buses. With links_dict (route label -> link, e.g. from the crawl state)
+    rows are also copied to every other label pointing at the same page, each with its own name and
+    link, exactly like the crawl's fan-out (redbus_route_index.fan_out_rows).
+    """
+    snapshots = archive.latest_snapshots(crawled_before)
+    tasks = [(archive.archive_dir, *snapshot) for snapshot in snapshots]
+    labels = build_route_index(links_dict) if links_dict else {}
+    archived_routes = {snapshot[0] for snapshot in snapshots}
+    rows = []
+    with Pool(processes=max(1, processes)) as pool:
+        for route_name, route_link, crawled_at, route_rows in pool.imap(_reparse_snapshot, tasks, chunksize=8):
+            departing_date = crawled_at[:10]
+            for row in route_rows:
+                row['departing_date'] = departing_date
+            rows.extend(route_rows)
+            other_labels = [(label, links_dict[label]) for label in labels.get(canonical_route_url(route_link), [])
+                            if label not in archived_routes]
+            for label_rows in fan_out_rows(route_rows, other_labels).values():
+                rows.extend(label_rows)
+    print(f"Reparsed {len(snapshots)} archived pages into {len(rows)} rows with {max(1, processes)} processes")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the raw page archive")
+    parser.add_argument("--archive-path", default=PAGE_ARCHIVE_DIR)
+    parser.add_argument("--show", metavar="ROUTE_NAME", help="print the newest archived HTML of one route")
+    args = parser.parse_args()
+
+    page_archive = PageArchive(args.archive_path)
+    if args.show:
+        matches = [snapshot for snapshot in page_archive.latest_snapshots() if snapshot[0] == args.show]
+        if not matches:
+            raise SystemExit(f"No archived page for route {args.show!r}")
+        print(load_page_source(args.archive_path, matches[0][3]))
+    else:
+        page_archive.print_footprint()
@@ -0,0 +1,89 @@
+import argparse
+import itertools
+import os
+import threading
+from datetime import date
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs
+
+PARQUET_STAGE_DIR = os.environ.get("REDBUS_PARQUET_STAGE", "parquet_stage")
+# Hive-style directories: <stage>/run_date=YYYY-MM-DD/agency=<url-encoded agency>/<run id>-<batch>-0.parquet
+PARTITION_COLUMNS = ['run_date', 'agency']
+# What the cleaner reads from a stage file; partition and ingestion columns are left on disk
+RAW_COLUMNS = ['route_name', 'route_link', 'bus_name', 'bus_type', 'departing_time', 'duration', 'reaching_time',
+               'star_rating', 'price', 'seats_available', 'departing_date']
+
+_batches = itertools.count()
+_batches_lock = threading.Lock()
+
+def write_parquet_stage(frame, stage_dir=PARQUET_STAGE_DIR, run_id="run"):
+    """Append scraped rows to the stage as Parquet, one file per (run_date, agency) partition.
+
+    Rows without a departing_date get today's, like the bus_details_backup column default. run_date is
+    the scrape date and agency the part of route_name before the first '_'. Every call writes new files,
+    so the streaming writer can flush into the same run. Returns the number of rows written.
+    """
+    if frame.empty:
+        return 0
+    frame = frame.copy()
+    if 'departing_date' not in frame.columns:
+        frame['departing_date'] = date.today()
+    frame['departing_date'] = frame['departing_date'].fillna(date.today())
+    frame['run_date'] = frame['departing_date'].astype(str)
+    frame['agency'] = frame['route_name'].astype(object).str.split('_', n=1).str[0].str.strip()
+    with _batches_lock:
+        batch = next(_batches)
+    ds.write_dataset(
+        pa.Table.from_pandas(frame, preserve_index=False), stage_dir, format="parquet",
+        partitioning=PARTITION_COLUMNS, partitioning_flavor="hive",
+        basename_template=f"{run_id}-{batch:05d}-{{i}}.parquet", existing_data_behavior="overwrite_or_ignore",
+    )
+    return len(frame)
+
+def open_parquet_stage(stage_dir=PARQUET_STAGE_DIR):
+    """The stage as a pyarrow dataset whose files are memory-mapped instead of read into buffers."""
+    return ds.dataset(stage_dir, format="parquet", partitioning="hive",
+                      filesystem=pyarrow.fs.LocalFileSystem(use_mmap=True))
+
+def stage_filter(run_dates=None, agencies=None, ingested_after=None):
+    """Dataset filter on the partition columns (pruned without opening files) and the ingestion time."""
+    conditions = []
+    if run_dates:
+        conditions.append(ds.field('run_date').isin([str(run_date) for run_date in run_dates]))
+    if agencies:
+        conditions.append(ds.field('agency').isin(list(agencies)))
+    if ingested_after is not None:
+        conditions.append(ds.field('ingested_at') > pa.scalar(ingested_after, type=pa.timestamp('us', tz='UTC')))
+    condition = None
+    for part in conditions:
+        condition = part if condition is None else condition & part
+    return condition
+
+def count_stage_rows(stage_dir=PARQUET_STAGE_DIR, **filters):
+    return open_parquet_stage(stage_dir).count_rows(filter=stage_filter(**filters))
+
+def read_parquet_chunks(stage_dir=PARQUET_STAGE_DIR, chunk_rows=50000, columns=RAW_COLUMNS, **filters):
+    """Yield the stage as DataFrames of at most chunk_rows rows, reading only columns (plus ingested_at).
+
+    The counterpart of reading bus_details_backup through a server-side cursor: the same raw columns,
+    one bounded chunk at a time. filters are passed to stage_filter.
+    """
+    dataset = open_parquet_stage(stage_dir)
+    columns = [column for column in columns + ['ingested_at'] if column in dataset.schema.names]
+    for batch in dataset.to_batches(columns=columns, filter=stage_filter(**filters), batch_size=chunk_rows):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def print_stage_footprint(stage_dir=PARQUET_STAGE_DIR):
+    dataset = open_parquet_stage(stage_dir)
+    size = sum(os.path.getsize(path) for path in dataset.files)
+    partitions = {os.path.dirname(path) for path in dataset.files}
+    print(f"Parquet stage {stage_dir}: {dataset.count_rows()} rows in {len(dataset.files)} files, "
+          f"{len(partitions)} partitions, {size / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the size of the Parquet stage")
+    parser.add_argument("stage_dir", nargs="?", default=PARQUET_STAGE_DIR)
+    args = parser.parse_args()
+    print_stage_footprint(args.stage_dir)
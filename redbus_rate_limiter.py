@@ -0,0 +1,240 @@
+from urllib.parse import urlsplit
+import argparse
+import asyncio
+import os
+import re
+import threading
+import time as sleep_time
+
+# Starting point for every host; the controller moves away from it based on what it observes
+INITIAL_RATE = float(os.environ.get("REDBUS_INITIAL_RATE", 2.0))  # requests per second
+INITIAL_CONCURRENCY = int(os.environ.get("REDBUS_INITIAL_CONCURRENCY", 2))
+MIN_RATE, MAX_RATE = 0.2, 50.0
+MIN_CONCURRENCY, MAX_CONCURRENCY = 1, int(os.environ.get("REDBUS_MAX_CONCURRENCY", 32))
+# A response slower than this counts as congestion, like a timeout
+TARGET_LATENCY = float(os.environ.get("REDBUS_TARGET_LATENCY", 4.0))
+# Bounds for the adaptive WebDriverWait timeouts handed out by page_timeout()
+MIN_PAGE_TIMEOUT, MAX_PAGE_TIMEOUT = 5.0, 30.0
+
+# Whole phrases only: a bare status code would also match route titles ("... 429 km", "Bus No 503")
+ERROR_PAGE_MARKERS = ("access denied", "too many requests", "error 429", "http 429", "503 service",
+                      "request blocked", "captcha")
+ERROR_PAGE_PATTERN = re.compile(r"\b(?:" + "|".join(re.escape(marker) for marker in ERROR_PAGE_MARKERS) + r")\b")
+
+def looks_like_error_page(title):
+    """Throttling/blocking pages come back as 200s in the browser; recognise them by title."""
+    return ERROR_PAGE_PATTERN.search((title or "").lower()) is not None
+
+class HostState:
+    """Token bucket plus AIMD concurrency limit for one host."""
+
+    def __init__(self):
+        self.rate = INITIAL_RATE
+        self.burst = max(1.0, INITIAL_RATE)
+        self.tokens = self.burst
+        self.refilled_at = sleep_time.monotonic()
+        self.concurrency = INITIAL_CONCURRENCY
+        self.in_flight = 0
+        self.successes_since_increase = 0
+        self.latency_ewma = None
+        self.completed = 0
+        self.errors = {"timeout": 0, "error_page": 0, "slow": 0, "exception": 0}
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+class AdaptiveScheduler:
+    """Every page fetch asks this scheduler for a slot.
+
+    Per host, a token bucket paces request starts and an AIMD controller limits requests in flight:
+    each window of fast successes adds one slot and 10% rate, while a timeout, error page or slow
+    response halves both.
+    """
+
+    def __init__(self):
+        self._hosts = {}
+        self._condition = threading.Condition()
+
+    def reset(self):
+        """Forget every host; the next request starts again from INITIAL_RATE / INITIAL_CONCURRENCY."""
+        with self._condition:
+            self._hosts = {}
+
+    def _host(self, url):
+        host = urlsplit(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = HostState()
+        return self._hosts[host]
+
+    def _try_acquire(self, url):
+        """Take a slot if possible; otherwise return how long to wait before trying again."""
+        with self._condition:
+            state = self._host(url)
+            now = sleep_time.monotonic()
+            state.refill(now)
+            if state.in_flight >= state.concurrency:
+                return None, 0.05
+            if state.tokens < 1:
+                return None, (1 - state.tokens) / state.rate
+            state.tokens -= 1
+            state.in_flight += 1
+            return state, 0.0
+
+    def acquire(self, url):
+        while True:
+            state, wait = self._try_acquire(url)
+            if state is not None:
+                return state
+            with self._condition:
+                self._condition.wait(timeout=wait)
+
+    async def acquire_async(self, url):
+        while True:
+            state, wait = self._try_acquire(url)
+            if state is not None:
+                return state
+            await asyncio.sleep(wait)
+
+    def release(self, state, latency, outcome="ok"):
+        """Feed one finished request back into the controller. outcome: ok, timeout, error_page or exception."""
+        with self._condition:
+            state.in_flight -= 1
+            state.completed += 1
+            state.latency_ewma = latency if state.latency_ewma is None else 0.8 * state.latency_ewma + 0.2 * latency
+            if outcome == "ok" and latency > TARGET_LATENCY:
+                outcome = "slow"
+
+            if outcome == "ok":
+                state.successes_since_increase += 1
+                # Additive increase once per window of successes the size of the current limit
+                if state.successes_since_increase >= state.concurrency:
+                    state.successes_since_increase = 0
+                    state.concurrency = min(MAX_CONCURRENCY, state.concurrency + 1)
+                    state.rate = min(MAX_RATE, state.rate * 1.1)
+                    state.burst = max(1.0, state.rate)
+            else:
+                # Multiplicative decrease
+                state.errors[outcome] += 1
+                state.successes_since_increase = 0
+                state.concurrency = max(MIN_CONCURRENCY, state.concurrency // 2)
+                state.rate = max(MIN_RATE, state.rate / 2)
+                state.burst = max(1.0, state.rate)
+                state.tokens = min(state.tokens, state.burst)
+            self._condition.notify_all()
+
+    def request(self, url):
+        """with SCHEDULER.request(url) as slot: ... ; exceptions count as timeouts/errors automatically."""
+        return _Slot(self, url)
+
+    def page_timeout(self, url):
+        """WebDriverWait timeout scaled to the host's observed latency."""
+        with self._condition:
+            latency = self._host(url).latency_ewma
+        if latency is None:
+            return MAX_PAGE_TIMEOUT / 2
+        return min(MAX_PAGE_TIMEOUT, max(MIN_PAGE_TIMEOUT, latency * 4))
+
+    def stats(self):
+        """Live per-host numbers: rate, concurrency limit, in-flight requests, latency and error counts."""
+        with self._condition:
+            return {
+                host: {
+                    "rate": round(state.rate, 2),
+                    "concurrency": state.concurrency,
+                    "in_flight": state.in_flight,
+                    "completed": state.completed,
+                    "latency_ewma": round(state.latency_ewma, 3) if state.latency_ewma is not None else None,
+                    "errors": dict(state.errors),
+                }
+                for host, state in self._hosts.items()
+            }
+
+    def print_stats(self):
+        for host, host_stats in self.stats().items():
+            print(f"[scheduler] {host}: {host_stats['rate']} req/s, concurrency {host_stats['in_flight']}/{host_stats['concurrency']}, "
+                  f"latency {host_stats['latency_ewma']}s, {host_stats['completed']} done, errors {host_stats['errors']}")
+
+    def start_reporter(self, interval=30.0):
+        """Print live stats every interval seconds from a daemon thread."""
+        def report():
+            while True:
+                sleep_time.sleep(interval)
+                self.print_stats()
+        threading.Thread(target=report, name="scheduler-reporter", daemon=True).start()
+
+class _Slot:
+    def __init__(self, scheduler, url):
+        self.scheduler = scheduler
+        self.url = url
+        self.outcome = "ok"
+
+    def error_page(self):
+        """Mark the response as a throttling/error page even though no exception was raised."""
+        self.outcome = "error_page"
+
+    def _finish(self, exc):
+        if exc is not None and self.outcome == "ok":
+            name = type(exc).__name__
+            self.outcome = "timeout" if "Timeout" in name else "exception"
+        self.scheduler.release(self.state, sleep_time.monotonic() - self.started, self.outcome)
+
+    def __enter__(self):
+        self.state = self.scheduler.acquire(self.url)
+        self.started = sleep_time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._finish(exc)
+        return False
+
+    async def __aenter__(self):
+        self.state = await self.scheduler.acquire_async(self.url)
+        self.started = sleep_time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self._finish(exc)
+        return False
+
+# Process-wide scheduler shared by the browser and HTTP fetch paths
+SCHEDULER = AdaptiveScheduler()
+
+if __name__ == "__main__":
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+    from redbus_fixture_server import start_fixture_server
+
+    parser = argparse.ArgumentParser(description="Watch the scheduler adapt to a local server with injected latency")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--fast-latency", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=6.0, help="latency injected during the middle third of the run")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of responses served as 429")
+    args = parser.parse_args()
+
+    served = {"count": 0}
+
+    def injected_latency():
+        # Fast, then a slow phase, then fast again
+        served["count"] += 1
+        third = args.requests / 3
+        return args.slow_latency if third <= served["count"] < 2 * third else args.fast_latency
+
+    server, base_url = start_fixture_server(latency=injected_latency, error_rate=args.error_rate)
+
+    def fetch(i):
+        url = f"{base_url}/route_server_rendered.html?i={i}"
+        with SCHEDULER.request(url) as slot:
+            try:
+                urllib.request.urlopen(url, timeout=MAX_PAGE_TIMEOUT).read()
+            except urllib.error.HTTPError as e:
+                if e.code in (429, 503):
+                    slot.error_page()
+                else:
+                    raise
+
+    SCHEDULER.start_reporter(interval=2.0)
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        list(executor.map(fetch, range(args.requests)))
+    SCHEDULER.print_stats()
+    server.shutdown()
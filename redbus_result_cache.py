@@ -0,0 +1,87 @@
+import os
+import pickle
+import threading
+import time as sleep_time
+from collections import OrderedDict
+
+# Memory bound of the cache (pickled size of the cached results)
+RESULT_CACHE_MB = float(os.environ.get("REDBUS_RESULT_CACHE_MB", 64))
+# How often the data-version marker is re-read; a load shows up in the frontend within this many seconds
+DATA_VERSION_CHECK_SECONDS = float(os.environ.get("REDBUS_DATA_VERSION_CHECK_SECONDS", 5))
+
+class VersionedResultCache:
+    """LRU cache of query results that empties itself when the data version changes.
+
+    read_version() returns the current data version (the loader bumps it after every write to the
+    table); it is called at most once per version_check_seconds. Entries are sized by their pickled
+    length and the least recently used ones are evicted beyond max_bytes. Failed computations are not
+    cached, and a result computed while the version changed is returned but not stored.
+    """
+
+    def __init__(self, read_version, max_bytes=int(RESULT_CACHE_MB * 1024 * 1024),
+                 version_check_seconds=DATA_VERSION_CHECK_SECONDS):
+        self._read_version = read_version
+        self.max_bytes = max_bytes
+        self.version_check_seconds = version_check_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._version_checked = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _current_version(self):
+        now = sleep_time.monotonic()
+        with self._lock:
+            if self._version_checked is not None and now - self._version_checked < self.version_check_seconds:
+                return self._version
+        try:
+            version = self._read_version()
+        except Exception as e:
+            # Keep serving the last known version rather than failing every page
+            print(f"Could not read the data version: {e}")
+            with self._lock:
+                return self._version
+        with self._lock:
+            self._version_checked = now
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._bytes = 0
+                self._version = version
+            return version
+
+    def get(self, key, compute):
+        """Cached result for key, calling compute() on a miss. key must be hashable and normalised."""
+        version = self._current_version()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+        value = compute()
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            if version != self._version or size > self.max_bytes:
+                return value
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"version": self._version, "entries": len(self._entries), "bytes": self._bytes,
+                    "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions, "invalidations": self.invalidations}
@@ -0,0 +1,41 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that never change which buses a route page lists: journey dates and tracking tags
+IGNORED_QUERY_PARAMS = {"doj", "onward", "date", "journeydate", "dateofjourney", "fbclid", "gclid", "ref"}
+
+def canonical_route_url(url):
+    """Normalise a route URL so the same page found under different agencies/tabs compares equal.
+
+    Lower-cases scheme and host, drops the fragment, date and tracking parameters, sorts the
+    remaining query parameters and removes trailing slashes from the path.
+    """
+    if not url:
+        return url
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in IGNORED_QUERY_PARAMS and not key.lower().startswith("utm_")
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+
+def build_route_index(links_dict):
+    """canonical URL -> every route label pointing at it, in discovery order."""
+    index = {}
+    for route_name, route_link in links_dict.items():
+        index.setdefault(canonical_route_url(route_link), []).append(route_name)
+    return index
+
+def fan_out_rows(rows, labels):
+    """label -> a copy of a page's rows for each (label, label_link), carrying that label's own name and link.
+
+    The crawl (mark_route_done) and the archive reparse both go through this, so they produce the same rows.
+    """
+    return {label: [dict(row, route_name=label, route_link=label_link) for row in rows] for label, label_link in labels}
+
+def print_route_index_report(links_dict):
+    index = build_route_index(links_dict)
+    shared = sum(1 for labels in index.values() if len(labels) > 1)
+    print(f"{len(links_dict)} route labels point at {len(index)} unique pages "
+          f"({shared} pages shared by several labels): {len(links_dict) - len(index)} page visits saved")
+    return index
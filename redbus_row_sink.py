@@ -0,0 +1,47 @@
+import pandas as pd
+
+class RowSink:
+    """Collects scraped rows in one Python list per column and builds DataFrames only when asked.
+
+    Replaces df.loc[len(df)] = row, which copies the whole DataFrame on every insert and makes a
+    crawl quadratic in the number of buses.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self._buffers = {column: [] for column in self.columns}
+
+    def __len__(self):
+        return len(self._buffers[self.columns[0]])
+
+    def append(self, row):
+        for column in self.columns:
+            self._buffers[column].append(row.get(column))
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def rows(self, start=0, stop=None):
+        """Buffered rows as dicts, e.g. rows(len_before) for the rows added by the last route."""
+        columns = [self._buffers[column][start:stop] for column in self.columns]
+        return [dict(zip(self.columns, values)) for values in zip(*columns)]
+
+    def to_frame(self, start=0, stop=None):
+        return pd.DataFrame({column: self._buffers[column][start:stop] for column in self.columns}, columns=self.columns)
+
+    def iter_frames(self, batch_size):
+        """Yield the buffered rows as DataFrames of at most batch_size rows."""
+        for start in range(0, len(self), batch_size):
+            yield self.to_frame(start, start + batch_size)
+
+    def to_arrow(self):
+        import pyarrow as pa
+
+        return pa.table({column: self._buffers[column] for column in self.columns})
+
+    def drain(self):
+        """Return everything buffered as one DataFrame and empty the sink."""
+        frame = self.to_frame()
+        self._buffers = {column: [] for column in self.columns}
+        return frame
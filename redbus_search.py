@@ -0,0 +1,106 @@
+import os
+from decimal import Decimal
+from redbus_bulk_loader import NATURAL_KEY
+
+# Rows per results page in the frontend
+SEARCH_PAGE_SIZE = int(os.environ.get("REDBUS_SEARCH_PAGE_SIZE", 50))
+# Searches matching up to this many rows are counted exactly; larger ones show the planner's estimate
+SEARCH_EXACT_COUNT_LIMIT = int(os.environ.get("REDBUS_SEARCH_EXACT_COUNT_LIMIT", 10000))
+
+# What a results row holds, in order
+SEARCH_COLUMNS = ['route_name', 'bus_name', 'bus_type', 'departing_time', 'duration_minutes', 'reaching_time',
+                  'star_rating_out_of_5', 'price_inr', 'total_seats', 'window_seats', 'route_link', 'departing_date']
+# Results are ordered cheapest first, then by departure; the rest of the natural key makes the order total
+PAGE_ORDER = ['price_inr', 'departing_time'] + [column for column in NATURAL_KEY if column != 'departing_time']
+PAGE_KEY_POSITIONS = [SEARCH_COLUMNS.index(column) for column in PAGE_ORDER]
+# A NULL would turn the keyset row comparison into NULL and drop the row from every later page, so each
+# sort key stands in for NULL with a sentinel: (SQL literal, the same value as a query parameter).
+# Prices and departures without a value sort last, like NULLS LAST.
+PAGE_KEY_NULLS = {
+    'price_inr': ("100000000", Decimal("100000000")),
+    'departing_time': ("'24:00'", "24:00"),
+    'route_name': ("''", ""),
+    'route_link': ("''", ""),
+    'bus_name': ("''", ""),
+    'departing_date': ("'infinity'", "infinity"),
+}
+# ORDER BY, cursor predicate and page_key all use these expressions
+PAGE_ORDER_SQL = [f"COALESCE({column}, {PAGE_KEY_NULLS[column][0]})" for column in PAGE_ORDER]
+
+def normalize_search_filters(route_id, departure_range, reaching_range,
+                             min_seats, min_window_seats, min_price, max_price, min_rating):
+    """Filter values as a hashable tuple in search_conditions argument order"""
+    def time_range(selected):
+        return None if not selected or selected == "Any Time" else tuple(selected.split(" - "))
+    return (route_id, time_range(departure_range), time_range(reaching_range),
+            int(min_seats), int(min_window_seats), int(min_price), int(max_price), float(min_rating))
+
+def search_conditions(route_id, departure_range, reaching_range,
+                      min_seats, min_window_seats, min_price, max_price, min_rating):
+    """WHERE clause and parameters for normalised filters (departure/reaching ranges are (start, end) or None)"""
+    query = "WHERE 1=1"
+    params = []
+
+    if route_id is not None:
+        query += " AND route_id = %s"
+        params.append(route_id)
+
+    if departure_range:
+        start_time, end_time = departure_range
+        query += " AND departing_time BETWEEN %s AND %s"
+        params.extend([start_time, end_time])
+
+    if reaching_range:
+        start_time, end_time = reaching_range
+        query += " AND reaching_time BETWEEN %s AND %s"
+        params.extend([start_time, end_time])
+
+    query += " AND total_seats >= %s"
+    params.append(min_seats)
+
+    query += " AND window_seats >= %s"
+    params.append(min_window_seats)
+
+    query += " AND price_inr BETWEEN %s AND %s"
+    params.extend([min_price, max_price])
+
+    query += " AND star_rating_out_of_5 >= %s"
+    params.append(min_rating)
+    return query, params
+
+def page_key(row):
+    """Keyset cursor of a results row: the next page starts after it. NULLs become their PAGE_KEY_NULLS sentinel."""
+    return tuple(PAGE_KEY_NULLS[column][1] if row[position] is None else row[position]
+                 for column, position in zip(PAGE_ORDER, PAGE_KEY_POSITIONS))
+
+def fetch_bus_page(connection, filters, after=None, page_size=SEARCH_PAGE_SIZE, table="bus_routes"):
+    """One page of matching rows in PAGE_ORDER, starting after the page_key after (None for the first page).
+
+    Fetches page_size + 1 rows; the extra row only tells the caller there is a next page. Seeking past the
+    last key keeps a deep page as cheap as the first, unlike OFFSET.
+    """
+    where, params = search_conditions(*filters)
+    if after is not None:
+        where += f" AND ({', '.join(PAGE_ORDER_SQL)}) > ({', '.join(['%s'] * len(PAGE_ORDER))})"
+        params.extend(after)
+    with connection.cursor() as cur:
+        cur.execute(f"SELECT {', '.join(SEARCH_COLUMNS)} FROM {table} {where} "
+                    f"ORDER BY {', '.join(PAGE_ORDER_SQL)} LIMIT %s", params + [page_size + 1])
+        return cur.fetchall()
+
+def count_buses(connection, filters, exact_limit=SEARCH_EXACT_COUNT_LIMIT, table="bus_routes"):
+    """(count, exact) of rows matching filters.
+
+    Counting stops after exact_limit + 1 rows; beyond that the planner's row estimate is returned instead,
+    so a broad search never counts the whole table.
+    """
+    where, params = search_conditions(*filters)
+    with connection.cursor() as cur:
+        cur.execute(f"SELECT count(*) FROM (SELECT 1 FROM {table} {where} LIMIT %s) AS matches",
+                    params + [exact_limit + 1])
+        count = cur.fetchone()[0]
+        if count <= exact_limit:
+            return count, True
+        cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} {where}", params)
+        estimate = int(cur.fetchone()[0][0]["Plan"]["Plan Rows"])
+        return max(estimate, count), False
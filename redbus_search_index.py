@@ -0,0 +1,197 @@
+import os
+import threading
+import time as sleep_time
+import numpy as np
+from redbus_result_cache import DATA_VERSION_CHECK_SECONDS
+from redbus_search import SEARCH_COLUMNS, PAGE_KEY_NULLS, PAGE_ORDER_SQL, SEARCH_PAGE_SIZE, page_key
+
+# "sql" sends every search to Postgres; "memory" answers it from a ColumnarSearchIndex snapshot
+SEARCH_ENGINE = os.environ.get("REDBUS_SEARCH_ENGINE", "sql")
+
+# Filter name -> bus_routes column with a sorted index
+INDEXED_COLUMNS = {'price': 'price_inr', 'departure': 'departing_time', 'arrival': 'reaching_time',
+                   'rating': 'star_rating_out_of_5', 'seats': 'total_seats'}
+
+def _minutes(value):
+    """datetime.time or 'HH:MM' as minutes after midnight"""
+    if isinstance(value, str):
+        hours, minutes = value.split(":")[:2]
+        return int(hours) * 60 + int(minutes)
+    return value.hour * 60 + value.minute + value.second / 60
+
+def _numeric(values, convert=float):
+    """float64 array with NaN for NULL; NaN fails every comparison, like NULL in the SQL filters"""
+    return np.array([np.nan if value is None else convert(value) for value in values], dtype=np.float64)
+
+class ColumnarSearchIndex:
+    """Read-only snapshot of bus_routes answering the search filters without a database round-trip.
+
+    Rows are stored grouped by route_id, so a route is a contiguous row range. Each INDEXED_COLUMNS
+    column has an argsort order; a search takes the narrowest of the route range and the searchsorted
+    value ranges and checks the remaining filters on those rows with vectorised comparisons. Page
+    positions come from Postgres (row_number over PAGE_ORDER_SQL) so results page exactly like the SQL path.
+    """
+
+    def __init__(self, route_ids, page_positions, values):
+        self.size = len(page_positions)
+        # SEARCH_COLUMNS values as fetched (str, time, Decimal, ...) for building result rows
+        self.values = {column: np.array(values[column], dtype=object) for column in SEARCH_COLUMNS}
+        self.numeric = {name: _numeric(values[column], _minutes if 'time' in column else float)
+                        for name, column in INDEXED_COLUMNS.items()}
+        self.numeric['window_seats'] = _numeric(values['window_seats'])
+        self.route_ids = _numeric(route_ids)
+        self.page_positions = np.asarray(page_positions, dtype=np.int64)
+        # Row of each page position, and the price/departure columns in page order for locating a cursor
+        # (NULLs replaced by the same sentinels the SQL ordering uses)
+        self.by_page = np.empty(self.size, dtype=np.int64)
+        self.by_page[self.page_positions] = np.arange(self.size)
+        self.page_price = np.nan_to_num(self.numeric['price'][self.by_page], nan=float(PAGE_KEY_NULLS['price_inr'][1]))
+        self.page_departure = np.nan_to_num(self.numeric['departure'][self.by_page],
+                                            nan=_minutes(PAGE_KEY_NULLS['departing_time'][1]))
+        self.sorted = {}
+        for name, column in self.numeric.items():
+            if name in INDEXED_COLUMNS:
+                order = np.argsort(column, kind='stable')
+                self.sorted[name] = (order, column[order])
+        self.route_ranges = {}
+        starts = np.flatnonzero(np.diff(self.route_ids, prepend=np.nan) != 0)
+        for start, stop in zip(starts, np.append(starts[1:], self.size)):
+            if not np.isnan(self.route_ids[start]):
+                self.route_ranges[int(self.route_ids[start])] = (int(start), int(stop))
+
+    @classmethod
+    def load(cls, connection, table="bus_routes"):
+        """Snapshot table in one query, grouped by route_id and numbered in PAGE_ORDER_SQL."""
+        with connection.cursor() as cur:
+            cur.execute(f"SELECT route_id, row_number() OVER (ORDER BY {', '.join(PAGE_ORDER_SQL)}) - 1 AS page_position, "
+                        f"{', '.join(SEARCH_COLUMNS)} FROM {table} ORDER BY route_id, page_position")
+            rows = cur.fetchall()
+        columns = list(zip(*rows)) if rows else [()] * (len(SEARCH_COLUMNS) + 2)
+        return cls(columns[0], columns[1], dict(zip(SEARCH_COLUMNS, columns[2:])))
+
+    def _value_ranges(self, filters):
+        route_id, departure_range, reaching_range, min_seats, min_window_seats, min_price, max_price, min_rating = filters
+        ranges = {'price': (min_price, max_price), 'seats': (min_seats, np.inf), 'rating': (min_rating, np.inf)}
+        if departure_range:
+            ranges['departure'] = tuple(_minutes(value) for value in departure_range)
+        if reaching_range:
+            ranges['arrival'] = tuple(_minutes(value) for value in reaching_range)
+        return ranges
+
+    def matches(self, filters):
+        """Rows matching normalised filters (redbus_search.normalize_search_filters), in page order."""
+        route_id, min_window_seats = filters[0], filters[4]
+        ranges = self._value_ranges(filters)
+        # Candidate row sets: the route's row range and each indexed column's value range
+        candidates = []
+        if route_id is not None:
+            start, stop = self.route_ranges.get(route_id, (0, 0))
+            candidates.append((stop - start, 'route', lambda: np.arange(start, stop)))
+        for name, (low, high) in ranges.items():
+            order, values = self.sorted[name]
+            first, last = np.searchsorted(values, low, 'left'), np.searchsorted(values, high, 'right')
+            candidates.append((last - first, name, lambda order=order, first=first, last=last: order[first:last]))
+        size, driver, rows = min(candidates, key=lambda candidate: candidate[0])
+        rows = rows()
+        if size:
+            keep = self.numeric['window_seats'][rows] >= min_window_seats
+            if driver != 'route' and route_id is not None:
+                keep &= self.route_ids[rows] == route_id
+            for name, (low, high) in ranges.items():
+                if name != driver:
+                    column = self.numeric[name][rows]
+                    keep &= (column >= low) & (column <= high)
+            rows = rows[keep]
+        return rows[np.argsort(self.page_positions[rows], kind='stable')]
+
+    def _page_position(self, key):
+        """Page position of the row whose page_key is key, or just before its price/departure group if it is gone."""
+        price, departure = float(key[0]), _minutes(key[1])
+        first, last = np.searchsorted(self.page_price, price, 'left'), np.searchsorted(self.page_price, price, 'right')
+        first, last = (first + np.searchsorted(self.page_departure[first:last], departure, 'left'),
+                       first + np.searchsorted(self.page_departure[first:last], departure, 'right'))
+        for position in range(first, last):
+            if page_key(self._row(self.by_page[position])) == tuple(key):
+                return position
+        # The snapshot was reloaded without that row: restart at its group rather than skip rows
+        return first - 1
+
+    def _row(self, row):
+        return tuple(self.values[column][row] for column in SEARCH_COLUMNS)
+
+    def fetch_bus_page(self, filters, after=None, page_size=SEARCH_PAGE_SIZE):
+        """Same rows as redbus_search.fetch_bus_page: page_size + 1 matches after the page_key after."""
+        rows = self.matches(filters)
+        if after is not None:
+            rows = rows[np.searchsorted(self.page_positions[rows], self._page_position(after), 'right'):]
+        rows = rows[:page_size + 1]
+        return list(zip(*(self.values[column][rows] for column in SEARCH_COLUMNS)))
+
+    def count_buses(self, filters):
+        """(count, exact) like redbus_search.count_buses; the snapshot always counts exactly."""
+        return len(self.matches(filters)), True
+
+    def nbytes(self):
+        return (sum(array.nbytes for array in self.numeric.values()) + self.route_ids.nbytes
+                + sum(order.nbytes + values.nbytes for order, values in self.sorted.values())
+                + self.page_positions.nbytes + self.by_page.nbytes + self.page_price.nbytes + self.page_departure.nbytes)
+
+class SearchIndexHolder:
+    """The current ColumnarSearchIndex, rebuilt when the data version changes.
+
+    read_version() is called at most once per version_check_seconds. A rebuild runs in the calling thread
+    while other threads keep searching the previous snapshot, then replaces it in one assignment; only the
+    very first load makes callers wait.
+    """
+
+    def __init__(self, load, read_version, version_check_seconds=DATA_VERSION_CHECK_SECONDS):
+        self._load = load
+        self._read_version = read_version
+        self.version_check_seconds = version_check_seconds
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._version_checked = None
+        self.loads = 0
+        self.load_seconds = 0.0
+
+    def current(self):
+        now = sleep_time.monotonic()
+        with self._lock:
+            index = self._index
+            if index is not None and now - self._version_checked < self.version_check_seconds:
+                return index
+        try:
+            version = self._read_version()
+        except Exception as e:
+            if index is None:
+                raise
+            # Keep serving the snapshot rather than failing every search
+            print(f"Could not read the data version: {e}")
+            return index
+        if index is not None and version == self._version:
+            with self._lock:
+                self._version_checked = now
+            return index
+        # Someone else is already rebuilding: search the old snapshot meanwhile
+        if not self._load_lock.acquire(blocking=index is None):
+            return index
+        try:
+            with self._lock:
+                if self._index is not None and self._version == version:
+                    return self._index
+            started = sleep_time.perf_counter()
+            index = self._load()
+            with self._lock:
+                self._index, self._version, self._version_checked = index, version, now
+                self.loads += 1
+                self.load_seconds = sleep_time.perf_counter() - started
+            return index
+        finally:
+            self._load_lock.release()
+
+    def stats(self):
+        with self._lock:
+            return {"version": self._version, "rows": self._index.size if self._index is not None else 0,
+                    "loads": self.loads, "load_seconds": self.load_seconds}
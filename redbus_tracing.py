@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import threading
+import time as sleep_time
+from collections import Counter
+from contextlib import contextmanager
+
+# Where span records are written as JSON lines; empty disables the file but keeps the in-memory summary
+TRACE_PATH = os.environ.get("REDBUS_TRACE_PATH", "redbus_trace.jsonl")
+# Span attribute used to add up stage timings per route for the slowest-routes report
+ROUTE_ATTRIBUTE = "route"
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+class Tracer:
+    """Times crawl stages per route and agency, counts retries and exceptions by type.
+
+    Every finished span is kept in memory for the end-of-run summary and, when a path is open,
+    appended to a JSONL file as {"ts", "stage", "seconds", "status", "error", "thread", **attributes};
+    an exception passing through nested spans is counted once, by the innermost span.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._file = None
+        self.durations = {}
+        self.route_seconds = Counter()
+        self.counters = Counter()
+        self.exceptions = Counter()
+
+    def reset(self):
+        """Forget everything recorded so far (the JSONL file is left alone)."""
+        with self._lock:
+            self.durations = {}
+            self.route_seconds = Counter()
+            self.counters = Counter()
+            self.exceptions = Counter()
+
+    def open(self, path=TRACE_PATH):
+        """Start writing span records to path (appending, so resumed runs keep one trace)."""
+        if path:
+            self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, record):
+        if self._file is not None:
+            self._file.write(json.dumps(record, default=str) + "\n")
+
+    def _count_exception(self, exc):
+        # Nested spans see the same exception; only the innermost one counts it
+        if getattr(self._local, "last_exception", None) is exc:
+            return False
+        self._local.last_exception = exc
+        self.exceptions[type(exc).__name__] += 1
+        return True
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        """with TRACER.span("parse", route=route_name): ... ; exceptions are counted and re-raised."""
+        started_at = sleep_time.time()
+        started = sleep_time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            seconds = sleep_time.perf_counter() - started
+            with self._lock:
+                counted = error is not None and self._count_exception(error)
+            record = {
+                "ts": round(started_at, 3),
+                "stage": stage,
+                "seconds": round(seconds, 6),
+                "status": "ok" if error is None else "error",
+                "error": type(error).__name__ if error is not None else None,
+                "error_counted": counted,
+                "thread": threading.current_thread().name,
+                **attributes,
+            }
+            with self._lock:
+                self.durations.setdefault(stage, []).append(seconds)
+                if ROUTE_ATTRIBUTE in attributes:
+                    self.route_seconds[attributes[ROUTE_ATTRIBUTE]] += seconds
+                self._write(record)
+
+    def exception(self, exc, stage, **attributes):
+        """Record an exception the caller handles itself (e.g. a skipped pagination button)."""
+        with self._lock:
+            if self._count_exception(exc):
+                self._write({"ts": round(sleep_time.time(), 3), "stage": stage, "event": "exception",
+                             "error": type(exc).__name__, "thread": threading.current_thread().name, **attributes})
+
+    def count(self, name, amount=1, **attributes):
+        """Bump a named counter such as a retry or browser restart."""
+        with self._lock:
+            self.counters[name] += amount
+            self._write({"ts": round(sleep_time.time(), 3), "event": "count", "name": name, "amount": amount,
+                         "thread": threading.current_thread().name, **attributes})
+
+    def summary(self, slowest=10):
+        with self._lock:
+            stages = {}
+            for stage, values in self.durations.items():
+                ordered = sorted(values)
+                stages[stage] = {
+                    "count": len(ordered),
+                    "total": sum(ordered),
+                    "p50": percentile(ordered, 0.50),
+                    "p95": percentile(ordered, 0.95),
+                    "p99": percentile(ordered, 0.99),
+                    "max": ordered[-1],
+                }
+            return {
+                "stages": stages,
+                "slowest_routes": self.route_seconds.most_common(slowest),
+                "counters": dict(self.counters),
+                "exceptions": dict(self.exceptions),
+            }
+
+    def print_summary(self, slowest=10):
+        summary = self.summary(slowest)
+        if not summary["stages"]:
+            print("No stages traced")
+            return summary
+        print(f"\n{'stage':<16}{'count':>8}{'total s':>10}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'max s':>9}")
+        for stage, numbers in sorted(summary["stages"].items(), key=lambda item: -item[1]["total"]):
+            print(f"{stage:<16}{numbers['count']:>8}{numbers['total']:>10.2f}{numbers['p50']:>9.3f}"
+                  f"{numbers['p95']:>9.3f}{numbers['p99']:>9.3f}{numbers['max']:>9.3f}")
+        if summary["slowest_routes"]:
+            print("Slowest routes (all stages): " + ", ".join(f"{route} {seconds:.2f}s" for route, seconds in summary["slowest_routes"]))
+        if summary["counters"]:
+            print(f"Counters: {summary['counters']}")
+        if summary["exceptions"]:
+            print(f"Exceptions by type: {summary['exceptions']}")
+        return summary
+
+# Process-wide tracer shared by the browser, HTTP and database stages
+TRACER = Tracer()
+
+def summarise_trace_file(path):
+    """Rebuild the end-of-run summary from a JSONL trace written by an earlier run."""
+    tracer = Tracer()
+    with open(path, encoding="utf-8") as trace_file:
+        for line in trace_file:
+            record = json.loads(line)
+            if record.get("event") == "count":
+                tracer.counters[record["name"]] += record["amount"]
+            elif record.get("event") == "exception":
+                tracer.exceptions[record["error"]] += 1
+            elif "stage" in record:
+                tracer.durations.setdefault(record["stage"], []).append(record["seconds"])
+                if ROUTE_ATTRIBUTE in record:
+                    tracer.route_seconds[record[ROUTE_ATTRIBUTE]] += record["seconds"]
+                if record.get("error_counted"):
+                    tracer.exceptions[record["error"]] += 1
+    return tracer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the per-stage summary of a crawl trace")
+    parser.add_argument("path", nargs="?", default=TRACE_PATH)
+    parser.add_argument("--slowest", type=int, default=10, help="how many of the slowest routes to list")
+    args = parser.parse_args()
+    summarise_trace_file(args.path).print_summary(args.slowest)